@@ -0,0 +1,81 @@
+import os
+import random
+
+WORDS = (
+    "account add back cancel change close confirm copy delete done download edit error file help home "
+    "language loading message more name next open password profile remove save search send settings share "
+    "sign update upload user welcome"
+).split()
+
+
+def generate_corpus(
+    root,
+    files=10,
+    messages=100,
+    locales=5,
+    placeables=0.3,
+    selections=0.1,
+    comments=0.2,
+    translated=0.5,
+    seed=0,
+):
+    rng = random.Random(seed)
+
+    os.makedirs(os.path.join(root, "en"), exist_ok=True)
+    for i in range(locales):
+        os.makedirs(os.path.join(root, f"lang-{i}"), exist_ok=True)
+
+    for i in range(files):
+        entries = generate_entries(rng, i, messages, placeables, selections, comments)
+
+        with open(os.path.join(root, "en", f"file-{i}.ftl"), "w") as f:
+            f.write(
+                "".join(
+                    (f"{comment}\n" if comment else "") + f"{message}\n"
+                    for comment, message in entries
+                )
+                # A message with only attributes, which isn't translated
+                + f"file-{i}-attributes =\n    .title = Title\n"
+            )
+
+        for j in range(locales):
+            with open(os.path.join(root, f"lang-{j}", f"file-{i}.ftl"), "w") as f:
+                f.write(
+                    "".join(
+                        f"{message}\n"
+                        for _, message in entries
+                        if not message.lstrip().startswith("#")
+                        and rng.random() < translated
+                    )
+                )
+
+
+def generate_entries(rng, file, messages, placeables, selections, comments):
+    entries = []
+
+    for i in range(messages):
+        if i % 25 == 0 and rng.random() < comments:
+            entries.append((None, f"\n## {sentence(rng, 4)}\n"))
+
+        comment = f"# {sentence(rng, 8)}" if rng.random() < comments else None
+        identifier = f"message-{file}-{i}"
+
+        if rng.random() < selections:
+            value = (
+                "{ $count ->\n"
+                f"    [one] {sentence(rng, 4)}\n"
+                f"   *[other] {{ $count }} {sentence(rng, 4)}\n"
+                "}"
+            )
+        elif rng.random() < placeables:
+            value = f"{sentence(rng, 3)} {{ $name }} {sentence(rng, 3)}"
+        else:
+            value = sentence(rng, rng.randint(1, 8))
+
+        entries.append((comment, f"{identifier} = {value}"))
+
+    return entries
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
@@ -0,0 +1,422 @@
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from argparse import ArgumentParser
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fluent.syntax import parse
+from fluent.syntax.ast import Message, Placeable, SelectExpression
+
+TOKEN = re.compile(r"\{\s*\d+\s*\}")
+
+
+class MockOpenAIServer:
+    def __init__(
+        self,
+        latency=0,
+        error_rate=0,
+        port=0,
+        data_dir=None,
+        batch_latency=0,
+        fault_rate=0,
+        error_status=429,
+        slow_rate=0,
+        slow_latency=0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fault_rate = fault_rate
+        self.error_status = error_status
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+        self.data_dir = data_dir or tempfile.mkdtemp(prefix="mock-openai-")
+        self.batch_latency = batch_latency
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), get_handler(self))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, error):
+        with self.lock:
+            self.requests += 1
+            self.errors += error
+
+    def complete(self, body):
+        user_message = body["messages"][-1]["content"]
+        content, _, instruction = user_message.rpartition("\n\n")
+
+        if "these languages: " in instruction:
+            langs = instruction.split("these languages: ")[1].split(".")[0]
+            translation = {
+                lang: add_faults(translate(content, lang), self.fault_rate)
+                for lang in langs.split(", ")
+            }
+        else:
+            lang = instruction.rstrip(".").rsplit(" ", 1)[-1]
+            translation = add_faults(translate(content, lang), self.fault_rate)
+
+        content = json.dumps(translation)
+        if random.random() < self.fault_rate / 4:
+            content = content[: len(content) // 2]
+        prompt_tokens = len(json.dumps(body["messages"])) // 4
+        completion_tokens = len(content) // 4
+
+        return content, {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+
+    def create_file(self, content, filename, purpose):
+        file = {
+            "id": f"file-{uuid.uuid4().hex}",
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+        with open(os.path.join(self.data_dir, file["id"]), "wb") as f:
+            f.write(content)
+        with open(os.path.join(self.data_dir, file["id"] + ".json"), "w") as f:
+            json.dump(file, f)
+
+        return file
+
+    def read_file(self, file_id):
+        with open(os.path.join(self.data_dir, os.path.basename(file_id)), "rb") as f:
+            return f.read()
+
+    def create_batch(self, body):
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex}",
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "completion_window": body["completion_window"],
+            "status": "in_progress",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        self.save_batch(batch)
+
+        threading.Thread(target=self.run_batch, args=(batch,), daemon=True).start()
+
+        return batch
+
+    def run_batch(self, batch):
+        time.sleep(self.batch_latency)
+
+        output = []
+        for line in self.read_file(batch["input_file_id"]).decode().splitlines():
+            request = json.loads(line)
+            content, usage = self.complete(request["body"])
+            output.append(
+                {
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "request_id": uuid.uuid4().hex,
+                        "body": get_completion(request["body"], content, usage),
+                    },
+                    "error": None,
+                }
+            )
+
+        output_file = self.create_file(
+            "".join(json.dumps(line) + "\n" for line in output).encode(),
+            "batch_output.jsonl",
+            "batch_output",
+        )
+        self.save_batch(
+            {
+                **batch,
+                "status": "completed",
+                "output_file_id": output_file["id"],
+                "request_counts": {
+                    "total": len(output),
+                    "completed": len(output),
+                    "failed": 0,
+                },
+            }
+        )
+
+    def save_batch(self, batch):
+        with open(os.path.join(self.data_dir, batch["id"] + ".json"), "w") as f:
+            json.dump(batch, f)
+
+    def get_batch(self, batch_id):
+        with open(
+            os.path.join(self.data_dir, os.path.basename(batch_id) + ".json")
+        ) as f:
+            return json.load(f)
+
+
+def get_completion(body, content, usage):
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body["model"],
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": usage,
+    }
+
+
+def get_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            parts = self.path.split("?")[0].strip("/").split("/")
+
+            try:
+                if parts[1:2] == ["batches"] and len(parts) == 3:
+                    self.send_json(200, mock.get_batch(parts[2]))
+                elif parts[1:2] == ["files"] and parts[3:] == ["content"]:
+                    content = mock.read_file(parts[2])
+
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                else:
+                    self.send_not_found()
+            except FileNotFoundError:
+                self.send_not_found()
+
+        def do_POST(self):
+            content = self.rfile.read(int(self.headers["Content-Length"]))
+
+            if self.path.endswith("/files"):
+                message = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+                    + content
+                )
+                fields = {
+                    part.get_param("name", header="content-disposition"): part
+                    for part in message.iter_parts()
+                }
+                self.send_json(
+                    200,
+                    mock.create_file(
+                        fields["file"].get_payload(decode=True),
+                        fields["file"].get_filename(),
+                        fields["purpose"].get_content(),
+                    ),
+                )
+                return
+            if self.path.endswith("/batches"):
+                self.send_json(200, mock.create_batch(json.loads(content)))
+                return
+
+            body = json.loads(content)
+
+            if random.random() < mock.error_rate:
+                mock.count(True)
+                if mock.error_status == 429:
+                    self.send_json(
+                        429,
+                        {
+                            "error": {
+                                "message": "Rate limit reached",
+                                "type": "requests",
+                            }
+                        },
+                        {"Retry-After": "0.1"},
+                    )
+                else:
+                    self.send_json(
+                        mock.error_status,
+                        {"error": {"message": "Server error", "type": "server_error"}},
+                    )
+                return
+
+            mock.count(False)
+            if random.random() < mock.slow_rate:
+                time.sleep(mock.slow_latency)
+            else:
+                time.sleep(mock.latency)
+
+            content, usage = mock.complete(body)
+            if body.get("stream"):
+                self.send_stream(body, content, usage)
+                return
+
+            self.send_json(200, get_completion(body, content, usage))
+
+        def send_not_found(self):
+            self.send_json(
+                404,
+                {"error": {"message": "Not found", "type": "invalid_request_error"}},
+            )
+
+        def send_json(self, status, data, headers=None):
+            content = json.dumps(data).encode()
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+
+            self.wfile.write(content)
+
+        def send_stream(self, body, content, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+
+            chunk = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body["model"],
+            }
+            for i in range(0, len(content), 16):
+                self.send_event(
+                    {
+                        **chunk,
+                        "choices": [
+                            {
+                                "index": 0,
+                                "delta": {"content": content[i : i + 16]},
+                                "finish_reason": None,
+                            }
+                        ],
+                    }
+                )
+            self.send_event({**chunk, "choices": [], "usage": usage})
+
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def send_event(self, data):
+            self.wfile.write(b"data: " + json.dumps(data).encode() + b"\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def translate(content, lang):
+    translation = {}
+
+    for elem in parse(content).body:
+        if not isinstance(elem, Message) or not elem.value:
+            continue
+
+        elements = elem.value.elements
+        if isinstance(elements[0], Placeable) and isinstance(
+            elements[0].expression, SelectExpression
+        ):
+            selector = elements[0].expression.selector
+            translation[elem.id.name] = [
+                {
+                    "variable": content[selector.span.start : selector.span.end],
+                    "variant": getattr(variant.key, "name", None) or variant.key.value,
+                    "translation": f"[{lang}] "
+                    + content[variant.value.span.start : variant.value.span.end],
+                    "is_default": variant.default,
+                }
+                for variant in elements[0].expression.variants
+            ]
+        else:
+            translation[elem.id.name] = (
+                f"[{lang}] " + content[elem.value.span.start : elem.value.span.end]
+            )
+
+    return translation
+
+
+# Breaks translations the way models sometimes do, to exercise validation and repairs
+def add_faults(translation, rate):
+    for identifier, value in list(translation.items()):
+        if random.random() >= rate:
+            continue
+
+        fault = random.choice(["missing", "value"])
+        if fault == "missing":
+            del translation[identifier]
+        elif isinstance(value, list):
+            for variant in value:
+                variant["is_default"] = True
+        elif TOKEN.search(value):
+            translation[identifier] = TOKEN.sub("", value, count=1)
+        else:
+            translation[identifier] = value + " {9}"
+
+    return translation
+
+
+def main():
+    parser = ArgumentParser(description="Run a mock OpenAI compatible API")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--data-dir")
+    parser.add_argument("--batch-latency", type=float, default=0)
+    parser.add_argument("--fault-rate", type=float, default=0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument(
+        "--slow-rate",
+        type=float,
+        default=0,
+        help="fraction of requests that take --slow-latency seconds instead, to simulate stalled completions",
+    )
+    parser.add_argument("--slow-latency", type=float, default=0)
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(
+        args.latency,
+        args.error_rate,
+        args.port,
+        args.data_dir,
+        args.batch_latency,
+        args.fault_rate,
+        args.error_status,
+        args.slow_rate,
+        args.slow_latency,
+    )
+    print(f"Serving on {server.url}")
+    server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.mock_server import MockOpenAIServer
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+DEFAULT_CONFIG_PATH = os.path.join(SRC, "gpt_ftl", "config.toml")
+
+
+def main():
+    parser = ArgumentParser(
+        description="Translate a synthetic corpus through a pool of mock servers and show how the requests were spread"
+    )
+    parser.add_argument(
+        "--backend",
+        action="append",
+        help="latency, error rate and error status code of a mock server separated by colons, can be given more "
+        "than once (default: 0.02:0:429, 0.1:0:429 and 0.02:1:500, a fast, a slow and a failing server)",
+        dest="backends",
+    )
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--locales", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=8)
+    args = parser.parse_args()
+
+    servers = [
+        MockOpenAIServer(
+            float(latency), float(error_rate), error_status=int(error_status)
+        ).start()
+        for latency, error_rate, error_status in (
+            backend.split(":")
+            for backend in args.backends or ["0.02:0:429", "0.1:0:429", "0.02:1:500"]
+        )
+    ]
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = run(tmp, servers, args)
+    finally:
+        for server in servers:
+            server.stop()
+
+    print(json.dumps(results, indent=2))
+
+
+def run(tmp, servers, args):
+    home = os.path.join(tmp, "home")
+    write_config(home, servers, args.jobs)
+
+    root = os.path.join(tmp, "corpus")
+    generate_corpus(
+        root, files=args.files, messages=args.messages, locales=args.locales
+    )
+
+    start = time.perf_counter()
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "gpt_ftl.main",
+            "translate",
+            root,
+            "en",
+            "--jobs",
+            str(args.jobs),
+            "--max-retries",
+            "10",
+            "--metrics",
+            os.path.join(tmp, "metrics"),
+            "--no-cache",
+        ],
+        env={
+            **os.environ,
+            "HOME": home,
+            "APPDATA": home,
+            "PYTHONPATH": os.pathsep.join([SRC, os.environ.get("PYTHONPATH", "")]),
+        },
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    duration = time.perf_counter() - start
+
+    with open(os.path.join(tmp, "metrics", "metrics.jsonl"), "r") as f:
+        metrics = [json.loads(line) for line in f]
+
+    return {
+        "duration": duration,
+        "requests": len(metrics),
+        "failed": len([metric for metric in metrics if metric["error"]]),
+        "backends": [
+            {
+                "name": f"mock-{i}",
+                "latency": server.latency,
+                "error_rate": server.error_rate,
+                "error_status": server.error_status,
+                "requests": server.requests,
+                "errors": server.errors,
+            }
+            for i, server in enumerate(servers)
+        ],
+    }
+
+
+def write_config(home, servers, jobs):
+    with open(DEFAULT_CONFIG_PATH, "r") as f:
+        config = f.read()
+
+    for i, server in enumerate(servers):
+        config += (
+            f'\n[[backends]]\nname = "mock-{i}"\nbase_url = "{server.url}"\n'
+            f'api_key = "benchmark"\njobs = {jobs}\n'
+        )
+
+    for directory in [
+        os.path.join(home, ".config", "gpt_ftl"),
+        os.path.join(home, "gpt_ftl"),
+    ]:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "config.toml"), "w") as f:
+            f.write(config)
+
+
+if __name__ == "__main__":
+    main()
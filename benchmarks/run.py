@@ -0,0 +1,235 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.mock_server import MockOpenAIServer, translate
+from benchmarks.startup import measure_startup
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        home = os.path.join(tmp, "home")
+        os.makedirs(home)
+        os.environ["HOME"] = home
+        os.environ["APPDATA"] = home
+        sys.path.insert(0, SRC)
+
+        root = os.path.join(tmp, "corpus")
+        generate_corpus(root, **get_corpus_args(args))
+
+        results = {
+            "commit": get_commit(),
+            "python": platform.python_version(),
+            "parameters": vars(args),
+            "stages": run_stages(root, tmp, args.repeat),
+            "startup": measure_startup(tmp, args.repeat),
+        }
+
+        if not args.skip_translate:
+            results["translate"] = run_translate(tmp, home, args)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description="Benchmark GPT FTL on a synthetic corpus and write the timings as JSON"
+    )
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--locales", type=int, default=5)
+    parser.add_argument("--placeables", type=float, default=0.3)
+    parser.add_argument("--selections", type=float, default=0.1)
+    parser.add_argument("--comments", type=float, default=0.2)
+    parser.add_argument("--translated", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--skip-translate", action="store_true")
+    parser.add_argument("--output", "-o")
+
+    return parser.parse_args()
+
+
+def get_corpus_args(args):
+    return {
+        "files": args.files,
+        "messages": args.messages,
+        "locales": args.locales,
+        "placeables": args.placeables,
+        "selections": args.selections,
+        "comments": args.comments,
+        "translated": args.translated,
+        "seed": args.seed,
+    }
+
+
+def run_stages(root, tmp, repeat):
+    from gpt_ftl.config import Config
+    from gpt_ftl.ftl_file import get_base_file_paths, get_file, get_path, get_paths
+    from gpt_ftl.index import ProjectIndex
+    from gpt_ftl.parser import Parser
+    from gpt_ftl.sort import sort_messages
+    from gpt_ftl.strip_comments import strip_comments
+
+    index_path = os.path.join(tmp, "index.json")
+    langs = sorted(lang for lang in os.listdir(root) if lang != "en")
+
+    sys.argv = ["gpt-ftl", "translate", root, "en"]
+    config = Config()
+
+    base_files = get_base_file_paths(root, "en", ProjectIndex(index_path))
+    files = [
+        (
+            base_file,
+            get_file(
+                get_path(root, lang, base_file.name), lang, ProjectIndex(index_path)
+            ),
+        )
+        for base_file in base_files
+        for lang in langs
+    ]
+    contents = []
+    for path in get_paths(root):
+        with open(path, "r") as f:
+            contents.append(f.read())
+    translations = [
+        translate("\n".join(message.get_ftl() for message in base_file.messages), "xx")
+        for base_file in base_files
+    ]
+
+    def save_index():
+        index = ProjectIndex(index_path)
+        get_base_file_paths(root, "en", index)
+        index.save()
+
+    save_index()
+
+    stages = {
+        "base_file_parsing": lambda: get_base_file_paths(
+            root, "en", ProjectIndex(os.path.join(tmp, "missing.json"))
+        ),
+        "base_file_parsing_warm": lambda: get_base_file_paths(
+            root, "en", ProjectIndex(index_path)
+        ),
+        "messages_filtered": lambda: [
+            base_file.messages_filtered(file.message_identifier_set)
+            for base_file, file in files
+        ],
+        "get_messages": lambda: [
+            config.get_messages(
+                config.get_system_messages(base_file.get_body()),
+                [lang],
+                "\n".join(message.get_ftl() for message in base_file.messages),
+            )
+            for base_file in base_files
+            for lang in langs
+        ],
+        "parser_get_ftl": lambda: [
+            Parser(translation).get_ftl() for translation in translations
+        ],
+        "strip_comments": lambda: [strip_comments(content) for content in contents],
+        "sort_messages": lambda: [
+            sort_messages(content, False) for content in contents
+        ],
+    }
+
+    return {name: time_stage(stage, repeat) for name, stage in stages.items()}
+
+
+def time_stage(stage, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+    }
+
+
+def run_translate(tmp, home, args):
+    server = MockOpenAIServer(args.latency, args.error_rate).start()
+    env = {
+        **os.environ,
+        "HOME": home,
+        "APPDATA": home,
+        "PYTHONPATH": os.pathsep.join([SRC, os.environ.get("PYTHONPATH", "")]),
+    }
+
+    timings = []
+    try:
+        for i in range(args.repeat):
+            root = os.path.join(tmp, f"translate-{i}")
+            generate_corpus(root, **get_corpus_args(args))
+
+            start = time.perf_counter()
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "gpt_ftl.main",
+                    "translate",
+                    root,
+                    "en",
+                    "--api-key",
+                    "benchmark",
+                    "--base-url",
+                    server.url,
+                    "--jobs",
+                    str(args.jobs),
+                    "--no-cache",
+                ],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+            timings.append(time.perf_counter() - start)
+    finally:
+        server.stop()
+
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "requests": server.requests,
+        "errors": server.errors,
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Runs the CLI the way the console script does, without the runpy overhead of python -m
+ENTRY_POINT = "import sys; from gpt_ftl.main import main; sys.argv[0] = 'gpt-ftl'; sys.exit(main())"
+
+SUBCOMMANDS = {
+    "help": ["--help"],
+    "sort": ["sort", "{root}"],
+    "strip_comments": ["strip-comments", "{root}"],
+}
+
+
+def main():
+    parser = ArgumentParser(
+        description="Check that the subcommands that don't use the API start within a time budget"
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=0.1,
+        help="seconds each subcommand may take at most (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = measure_startup(tmp, args.repeat)
+
+    failed = False
+    for name, timing in results.items():
+        over = name in SUBCOMMANDS and timing > args.budget
+        failed |= over
+        print(f"{name}: {timing * 1000:.0f} ms{' (over budget)' if over else ''}")
+
+    if failed:
+        print(f"Startup is over the budget of {args.budget * 1000:.0f} ms")
+        sys.exit(1)
+
+
+def measure_startup(tmp, repeat):
+    home = os.path.join(tmp, "startup-home")
+    root = os.path.join(tmp, "startup-corpus")
+    os.makedirs(home, exist_ok=True)
+    # An empty tree, so that only startup is measured and not the work on the files
+    os.makedirs(os.path.join(root, "en"), exist_ok=True)
+
+    env = {
+        **os.environ,
+        "HOME": home,
+        "APPDATA": home,
+        "PYTHONPATH": os.pathsep.join([SRC, os.environ.get("PYTHONPATH", "")]),
+    }
+
+    # The first run creates the configuration file and its cache
+    run([sys.executable, "-c", ENTRY_POINT, "--help"], env)
+
+    results = {"interpreter": time_command([sys.executable, "-c", ""], env, repeat)}
+    for name, args in SUBCOMMANDS.items():
+        command = [sys.executable, "-c", ENTRY_POINT]
+        command += [arg.format(root=root) for arg in args]
+        results[name] = time_command(command, env, repeat)
+
+    return results
+
+
+def time_command(command, env, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(command, env)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def run(command, env):
+    subprocess.run(
+        command,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from openai.types.chat import ChatCompletion
+
+from gpt_ftl.metrics import get_pricing
+from gpt_ftl.print_colored import (
+    print_action_start,
+    print_action_done,
+    print_error,
+    print_warning,
+    format_value,
+)
+
+
+class BatchResults:
+    def __init__(self, results, metrics, config):
+        self.results = results
+        self.metrics = metrics
+        self.config = config
+
+    async def request(
+        self, model, messages, completion_tokens, name, langs, listener=None
+    ):
+        metric = self.metrics.start(name, langs, model)
+
+        result = self.results.get(get_custom_id(get_body(model, messages)))
+        if result is None:
+            metric.error = "Missing from batch"
+            raise ValueError(
+                "The request isn't part of the batch or failed in it, translate again to retry it"
+            )
+
+        response = ChatCompletion.model_validate(result)
+        if response.usage:
+            metric.set_usage(response.usage, get_pricing(self.config, model))
+
+        content = response.choices[0].message.content
+        if listener:
+            listener.start()
+            listener.feed(content)
+
+        return content
+
+
+async def get_batch_results(client, metrics, config, plan):
+    if config.batch_id:
+        batch_id = config.batch_id
+    else:
+        requests = {}
+        for request in plan.requests():
+            body = get_body(request.model, request.messages)
+            requests[get_custom_id(body)] = body
+
+        if not requests:
+            return BatchResults({}, metrics, config)
+
+        batch_id = await submit(client, requests, config)
+
+    batch = await wait(client, batch_id, config)
+
+    return BatchResults(await download(client, batch), metrics, config)
+
+
+async def submit(client, requests, config):
+    path = os.path.join(config.dir, "batches", f"{int(time.time())}.jsonl")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "w") as f:
+        for custom_id, body in requests.items():
+            request = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }
+            f.write(json.dumps(request) + "\n")
+
+    with open(path, "rb") as f:
+        input_file = await client.files.create(file=f, purpose="batch")
+
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+
+    print_action_done(
+        f"Submitted batch {format_value(batch.id)} with {len(requests)} requests from {format_value(path)}. "
+        f"If interrupted, continue waiting for it with {format_value(f'--batch-id {batch.id}')}."
+    )
+
+    return batch.id
+
+
+async def wait(client, batch_id, config):
+    while True:
+        batch = await client.batches.retrieve(batch_id)
+
+        if batch.status in ("completed", "expired", "cancelled", "failed"):
+            break
+
+        counts = batch.request_counts
+        print_action_start(
+            f"Batch {format_value(batch_id)} is {batch.status}"
+            + (
+                f", {counts.completed + counts.failed}/{counts.total} done"
+                if counts
+                else ""
+            )
+            + f", checking again in {config.batch_poll_interval} seconds..."
+        )
+        await asyncio.sleep(config.batch_poll_interval)
+
+    if batch.status == "failed" or not batch.output_file_id:
+        errors = batch.errors.data if batch.errors else []
+        print_error(
+            f"Batch {format_value(batch_id)} {batch.status}"
+            + "".join(f"\n- {error.message}" for error in errors)
+        )
+        exit(1)
+    if batch.status != "completed":
+        print_warning(
+            f"Batch {format_value(batch_id)} {batch.status}, applying the requests that completed."
+        )
+
+    return batch
+
+
+async def download(client, batch):
+    content = await client.files.content(batch.output_file_id)
+
+    results = {}
+    for line in content.text.splitlines():
+        if not line:
+            continue
+
+        result = json.loads(line)
+        response = result.get("response")
+        if response and response["status_code"] == 200:
+            results[result["custom_id"]] = response["body"]
+
+    return results
+
+
+def get_body(model, messages):
+    return {
+        "model": model,
+        "messages": messages,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def get_custom_id(body):
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
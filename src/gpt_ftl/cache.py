@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+
+class TranslationMemory:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+    def get(self, key):
+        row = self.connection.execute(
+            "SELECT value FROM translations WHERE key = ?", (key,)
+        ).fetchone()
+
+        return row[0] if row else None
+
+    def set_many(self, items):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO translations (key, value) VALUES (?, ?)", items
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+class NoTranslationMemory:
+    def get(self, key):
+        return None
+
+    def set_many(self, items):
+        pass
+
+    def close(self):
+        pass
+
+
+def get_translation_memory(config):
+    if not config.cache:
+        return NoTranslationMemory()
+
+    return TranslationMemory(os.path.join(config.dir, "translation_memory.sqlite3"))
+
+
+def get_key(message, lang, model, system_messages, user_prompt):
+    key = json.dumps(
+        [
+            message.comments,
+            message.value,
+            lang,
+            model,
+            sorted(system_messages),
+            user_prompt,
+        ]
+    )
+
+    return hashlib.sha256(key.encode()).hexdigest()
@@ -0,0 +1,35 @@
+from itertools import groupby
+
+from gpt_ftl.scheduler import estimate_completion_tokens
+
+
+def chunk_messages(messages, max_tokens):
+    chunks = []
+    chunk = []
+    chunk_tokens = 0
+
+    for _, section in groupby(messages, key=lambda message: message.section):
+        section = [
+            (message, estimate_completion_tokens(message.get_ftl()))
+            for message in section
+        ]
+
+        section_tokens = sum(tokens for _, tokens in section)
+        if chunk and chunk_tokens + section_tokens > max_tokens:
+            chunks.append(chunk)
+            chunk = []
+            chunk_tokens = 0
+
+        for message, tokens in section:
+            if chunk and chunk_tokens + tokens > max_tokens:
+                chunks.append(chunk)
+                chunk = []
+                chunk_tokens = 0
+
+            chunk.append(message)
+            chunk_tokens += tokens
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
@@ -1,25 +1,22 @@
-import importlib.resources
+import json
 import os.path
-from argparse import ArgumentParser
-
-import tomli
-import tomli_w
-from fluent.syntax.ast import (
-    ResourceComment,
-    GroupComment,
-    Comment,
-    Message,
-    Placeable,
-    SelectExpression,
-)
+from argparse import ArgumentParser, ArgumentTypeError
 
 from gpt_ftl.print_colored import print_action_done, format_value, footer, format_footer
 
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.toml")
+
+SYSTEM_PROMPTS = [
+    "triple_hash_comment",
+    "double_hash_comment",
+    "single_hash_comment",
+    "placeable",
+    "selection",
+]
+
 
 class Config:
     def __init__(self):
-        default = importlib.resources.open_text("gpt_ftl", "config.toml").read()
-
         if os.name == "nt":
             config_path = os.path.join(os.getenv("APPDATA"), "gpt_ftl/config.toml")
         else:
@@ -28,6 +25,8 @@ class Config:
         if not os.path.exists(config_path):
             os.makedirs(os.path.dirname(config_path), exist_ok=True)
 
+            with open(DEFAULT_CONFIG_PATH, "r") as f:
+                default = f.read()
             with open(config_path, "w") as f:
                 f.write(default)
 
@@ -35,19 +34,17 @@ class Config:
                 f"Created default configuration file at {format_value(config_path)}. Edit it to change or add prompts."
             )
 
-        with open(config_path, "r") as f:
-            content = f.read()
-
-            if content != default:
-                custom_config_footer = (
-                    "If the changes might be relevant to other users, please consider sharing the custom configuration "
-                    "at https://lara.lv/gpt_ftl/issues/new."
-                )
-                print_action_done(
-                    f"Loaded custom configuration.\n{format_footer(custom_config_footer)}"
-                )
+        self.dir = os.path.dirname(config_path)
 
-            toml = tomli.loads(content)
+        custom, toml = load(config_path, os.path.join(self.dir, "config_cache.json"))
+        if custom:
+            custom_config_footer = (
+                "If the changes might be relevant to other users, please consider sharing the custom configuration "
+                "at https://lara.lv/gpt_ftl/issues/new."
+            )
+            print_action_done(
+                f"Loaded custom configuration.\n{format_footer(custom_config_footer)}"
+            )
 
         self.toml = toml
 
@@ -57,6 +54,8 @@ class Config:
         return self.toml[item]
 
     def __setitem__(self, key, value):
+        import tomli_w
+
         self.toml[key] = value
 
         with open("config.toml", "wb") as f:
@@ -74,29 +73,102 @@ class Config:
         )
 
         add_root_argument(translate_parser)
+        add_translate_arguments(translate_parser)
 
         translate_parser.add_argument(
-            "base_lang",
-            help="language to translate from, must match a directory in the FTL root path",
+            "--resume",
+            action="store_true",
+            help="continue the last run that was interrupted or had failures, skipping the files it already "
+            "translated, the run is recorded in a journal in the FTL root path (default: off)",
+            dest="resume",
         )
 
         translate_parser.add_argument(
-            "--api-key",
-            "-k",
-            default=os.getenv("OPENAI_API_KEY"),
-            help="OpenAI API key, can be obtained from https://platform.openai.com/api-keys, the key must have model "
-            "capabilities allowed (default: environment variable OPENAI_API_KEY)",
-            dest="api_key",
+            "--metrics",
+            help="directory to write the metrics of each request to, as JSON Lines to metrics.jsonl and in the "
+            "Prometheus text format to metrics.prom, costs are estimated using the pricing table of the "
+            "configuration file",
+            dest="metrics",
         )
 
         translate_parser.add_argument(
-            "--model",
-            "-m",
-            default="gpt-4o",
-            help="model to use for translation, models can be found at https://platform.openai.com/docs/models, the model "
-            "must support JSON mode, pricing for models can be found at https://openai.com/api/pricing "
-            "(default: %(default)s)",
-            dest="model",
+            "--plan",
+            action="store_true",
+            help="only print what would be translated, the number of requests, estimated tokens and estimated cost "
+            "without making any requests or changing any files (default: off)",
+            dest="plan",
+        )
+
+        translate_parser.add_argument(
+            "--plan-json",
+            help="file to write the plan to as JSON, with the messages to translate for each file and the estimates "
+            "for each request",
+            dest="plan_json",
+        )
+
+        translate_parser.add_argument(
+            "--batch",
+            action="store_true",
+            help="send all requests as a single job to the Batch API, which costs half as much but may take up to 24 "
+            "hours, the tool waits for the batch to finish and then writes the translations (default: off)",
+            dest="batch",
+        )
+
+        translate_parser.add_argument(
+            "--batch-id",
+            help="continue waiting for a batch submitted by an earlier run with --batch and write its translations",
+            dest="batch_id",
+        )
+
+        translate_parser.add_argument(
+            "--batch-poll-interval",
+            type=int,
+            default=60,
+            help="seconds to wait between checking the status of the batch (default: %(default)s)",
+            dest="batch_poll_interval",
+        )
+
+        watch_parser = subparsers.add_parser(
+            "watch",
+            help="Watch the files of the base language and translate the messages that change as soon as they're "
+            "saved, keeping the parsed files and the API client between changes",
+        )
+
+        add_root_argument(watch_parser)
+        add_translate_arguments(watch_parser)
+
+        watch_parser.add_argument(
+            "--debounce",
+            type=float,
+            default=0.5,
+            help="seconds to wait for more changes after a file is saved before translating, so that saves in quick "
+            "succession are translated together (default: %(default)s)",
+            dest="debounce",
+        )
+
+        watch_parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1,
+            help="seconds between checking the files for changes when inotify isn't available (default: %(default)s)",
+            dest="poll_interval",
+        )
+
+        watch_parser.add_argument(
+            "--poll",
+            action="store_true",
+            help="check the files for changes every --poll-interval seconds instead of using inotify, for file "
+            "systems that don't support it such as network shares (default: off)",
+            dest="poll",
+        )
+
+        watch_parser.set_defaults(
+            resume=False,
+            metrics=None,
+            plan=False,
+            plan_json=None,
+            batch=False,
+            batch_id=None,
         )
 
         strip_comments_parser = subparsers.add_parser(
@@ -105,14 +177,16 @@ class Config:
         )
 
         add_root_argument(strip_comments_parser)
+        add_jobs_argument(strip_comments_parser)
 
         sort_parser = subparsers.add_parser(
             "sort",
-            help="Sort messages in FTL files alphabetically, useful because translations returned by GPT aren't "
-            "guaranteed to match the ordering of the original messages",
+            help="Sort messages in FTL files alphabetically, translations are already written in the order of the base "
+            "file, so this is only needed to order the files alphabetically",
         )
 
         add_root_argument(sort_parser)
+        add_jobs_argument(sort_parser)
 
         sort_parser.add_argument(
             "--separate-by-newline",
@@ -124,37 +198,67 @@ class Config:
 
         parser.parse_args(namespace=self)
 
-    def get_messages(self, body, lang, translate_content):
-        prompts = self["prompts"]
+        # Each language of a request gets an equal share of the chunk's tokens
+        if (
+            self.subcommand in ("translate", "watch")
+            and self.chunk_tokens < self.locales_per_request
+        ):
+            parser.error("--chunk-tokens must be at least --locales-per-request")
+
+    def get_system_messages(self, body):
+        from fluent.syntax.ast import (
+            ResourceComment,
+            GroupComment,
+            Comment,
+            Message,
+            Placeable,
+            SelectExpression,
+        )
 
-        system_messages = {prompts["role"], prompts["assignment"]}
+        prompts = self["prompts"]
 
-        if prompts["custom"]:
-            system_messages.update(prompts["custom"])
+        names = set()
 
         for elem in body:
             if isinstance(elem, ResourceComment):
-                system_messages.add(prompts["triple_hash_comment"])
+                names.add("triple_hash_comment")
             if isinstance(elem, GroupComment):
-                system_messages.add(prompts["double_hash_comment"])
+                names.add("double_hash_comment")
             if isinstance(elem, Comment):
-                system_messages.add(prompts["single_hash_comment"])
+                names.add("single_hash_comment")
 
             if isinstance(elem, Message):
                 if elem.comment:
-                    system_messages.add(prompts["single_hash_comment"])
+                    names.add("single_hash_comment")
+
+                # Messages with only attributes have no value
+                if not elem.value:
+                    continue
 
                 for message_elem in elem.value.elements:
                     if not isinstance(message_elem, Placeable):
                         continue
 
-                    system_messages.add(prompts["placeable"])
+                    names.add("placeable")
 
                     if isinstance(message_elem.expression, SelectExpression):
-                        system_messages.add(prompts["selection"])
+                        names.add("selection")
+
+        system_messages = [prompts["role"], prompts["assignment"]]
+        system_messages += prompts["custom"]
+        system_messages += [prompts[name] for name in SYSTEM_PROMPTS if name in names]
+
+        return list(dict.fromkeys(system_messages))
 
-        user_message = prompts["user"].format(
-            lang=lang, translate_content=translate_content
+    def get_user_prompt(self, langs):
+        if len(langs) == 1:
+            return self["prompts"]["user"]
+
+        return self["prompts"]["multi_locale_user"]
+
+    def get_messages(self, system_messages, langs, translate_content):
+        user_message = self.get_user_prompt(langs).format(
+            lang=langs[0], langs=", ".join(langs), translate_content=translate_content
         )
 
         return [
@@ -162,6 +266,220 @@ class Config:
         ] + [{"role": "user", "content": user_message}]
 
 
+# Parsing TOML is slow enough to matter for the subcommands that run in pre-commit hooks, so the merged configuration
+# is cached as JSON until either file changes
+def load(config_path, cache_path):
+    key = [get_stat(config_path), get_stat(DEFAULT_CONFIG_PATH)]
+
+    try:
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+
+        if cache["key"] == key:
+            return cache["custom"], cache["toml"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    import tomli
+
+    with open(DEFAULT_CONFIG_PATH, "r") as f:
+        default = f.read()
+    with open(config_path, "r") as f:
+        content = f.read()
+
+    toml = tomli.loads(content)
+    for name, value in tomli.loads(default).items():
+        toml[name] = {**value, **toml.get(name, {})}
+
+    custom = content != default
+
+    try:
+        cache = json.dumps({"key": key, "custom": custom, "toml": toml})
+
+        with open(cache_path, "w") as f:
+            f.write(cache)
+    except (OSError, TypeError):
+        pass
+
+    return custom, toml
+
+
+def get_stat(path):
+    stat = os.stat(path)
+
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def add_translate_arguments(parser):
+    parser.add_argument(
+        "base_lang",
+        help="language to translate from, must match a directory in the FTL root path",
+    )
+
+    parser.add_argument(
+        "--api-key",
+        "-k",
+        default=os.getenv("OPENAI_API_KEY"),
+        help="OpenAI API key, can be obtained from https://platform.openai.com/api-keys, the key must have model "
+        "capabilities allowed (default: environment variable OPENAI_API_KEY)",
+        dest="api_key",
+    )
+
+    parser.add_argument(
+        "--model",
+        "-m",
+        default="gpt-4o",
+        help="model to use for translation, models can be found at https://platform.openai.com/docs/models, the model "
+        "must support JSON mode, pricing for models can be found at https://openai.com/api/pricing "
+        "(default: %(default)s)",
+        dest="model",
+    )
+
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=positive_int,
+        default=8,
+        help="maximum number of translations to run at the same time, languages take turns so that each one makes "
+        "steady progress (default: %(default)s)",
+        dest="jobs",
+    )
+
+    parser.add_argument(
+        "--chunk-tokens",
+        type=positive_int,
+        default=4000,
+        help="estimated number of output tokens to request at most at once, larger files are split into chunks "
+        "that are translated in parallel, keeping sections started with ## together where possible, this must be "
+        "below the output token limit of the model (default: %(default)s)",
+        dest="chunk_tokens",
+    )
+
+    parser.add_argument(
+        "--locales-per-request",
+        type=positive_int,
+        default=1,
+        help="number of languages to translate to in a single request, sending the content once for all of them "
+        "instead of once per language, which uses fewer input tokens and requests (default: %(default)s)",
+        dest="locales_per_request",
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="stream responses and write each message as soon as it's received instead of waiting for the whole "
+        "response, messages received before an error are kept (default: off)",
+        dest="stream",
+    )
+
+    parser.add_argument(
+        "--base-url",
+        default=os.getenv("OPENAI_BASE_URL"),
+        help="base URL of an OpenAI compatible API (default: environment variable OPENAI_BASE_URL or OpenAI's API)",
+        dest="base_url",
+    )
+
+    parser.add_argument(
+        "--rpm",
+        type=non_negative_int,
+        default=0,
+        help="requests per minute allowed for the API key, requests are held back to stay under it, 0 disables the "
+        "limit, limits can be found at https://platform.openai.com/account/limits (default: %(default)s)",
+        dest="rpm",
+    )
+
+    parser.add_argument(
+        "--tpm",
+        type=non_negative_int,
+        default=0,
+        help="tokens per minute allowed for the API key, requests are held back to stay under it using an estimate "
+        "of their tokens, 0 disables the limit (default: %(default)s)",
+        dest="tpm",
+    )
+
+    parser.add_argument(
+        "--max-retries",
+        type=non_negative_int,
+        default=6,
+        help="number of times to retry a request that was rate limited or failed because of the server, waiting "
+        "longer each time (default: %(default)s)",
+        dest="max_retries",
+    )
+
+    parser.add_argument(
+        "--max-repairs",
+        type=int,
+        default=2,
+        help="number of times to request the translations that are missing or invalid in a response again, only "
+        "those translations are requested, translations are invalid if they have different placeables or "
+        "variants than the source (default: %(default)s)",
+        dest="max_repairs",
+    )
+
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=0,
+        help="send a duplicate of a request that is slower than this percentile of the latencies of the requests so "
+        "far, such as 95, use the response that finishes first and cancel the other, 0 disables this (default: "
+        "%(default)s)",
+        dest="hedge_percentile",
+    )
+
+    parser.add_argument(
+        "--hedge-budget",
+        type=float,
+        default=0.1,
+        help="fraction of requests that may be sent twice by --hedge-percentile, which limits what the duplicates "
+        "cost (default: %(default)s)",
+        dest="hedge_budget",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_false",
+        help="don't reuse or store translations in the translation memory kept next to the configuration file, "
+        "translations are reused when the source, language, model and prompts match (default: off)",
+        dest="cache",
+    )
+
+    parser.add_argument(
+        "--separate-comments",
+        action="store_true",
+        help="identical strings are translated once for each language and shared by every message that uses "
+        "them, with the comments of all of them as context, this only shares them between messages with the same "
+        "comments, for strings whose translation depends on their context (default: off)",
+        dest="separate_comments",
+    )
+
+
+def add_jobs_argument(parser):
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=positive_int,
+        default=os.cpu_count(),
+        help="number of files to process at the same time (default: number of CPUs)",
+        dest="jobs",
+    )
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise ArgumentTypeError(f"must be at least 1, not {number}")
+
+    return number
+
+
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise ArgumentTypeError(f"must be at least 0, not {number}")
+
+    return number
+
+
 def add_root_argument(parser):
     parser.add_argument(
         "root",
@@ -0,0 +1,54 @@
+import asyncio
+from collections import OrderedDict, deque
+
+from gpt_ftl.print_colored import print_batch_action, print_error, format_value
+
+
+class Engine:
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.queues = OrderedDict()
+        self.total = 0
+        self.done = 0
+        self.failed = []
+
+    def add(self, lang, name, job):
+        self.queues.setdefault(lang, deque()).append((name, job))
+        self.total += 1
+
+    def next_job(self):
+        while self.queues:
+            lang, queue = next(iter(self.queues.items()))
+
+            if not queue:
+                del self.queues[lang]
+                continue
+
+            self.queues.move_to_end(lang)
+            return queue.popleft()
+
+        return None
+
+    async def worker(self):
+        while True:
+            next_job = self.next_job()
+            if next_job is None:
+                return
+
+            name, job = next_job
+            try:
+                await job()
+            except Exception as e:
+                self.failed.append(name)
+                print_error(f"Failed translating {format_value(name)}: {e}")
+                continue
+
+            self.done += 1
+            print_batch_action(
+                f"Translated {format_value(name)}...", self.done, self.total
+            )
+
+    async def run(self):
+        await asyncio.gather(
+            *(self.worker() for _ in range(max(min(self.jobs, self.total), 1)))
+        )
@@ -1,28 +1,50 @@
-import json
 import os
 
-from fluent.syntax import parse
-from fluent.syntax.ast import Message
-
-from gpt_ftl.parser import MessageParser, Parser
+from gpt_ftl.parser import MessageParser
 from gpt_ftl.print_colored import print_warning, format_value, format_list
 
+# Files are sent to the worker processes in chunks, so a process pool only helps with more than a chunk of files
+CHUNK_SIZE = 64
+
 
 class FtlFile:
-    def __init__(self, file, lang):
-        self.name = os.path.basename(file.name)
-        self.content = file.read()
+    def __init__(self, path, lang, index):
+        self.name = os.path.basename(path)
+        self.path = path
         self.lang = lang
+        self.index = index
+        self.indexed_messages = index.get(path) if os.path.exists(path) else []
 
         self.message_identifiers = []
-        for message in parse(self.content).body:
-            if not isinstance(message, Message):
-                continue
+        self.spans = {}
+        self.value_spans = {}
+        for message in self.indexed_messages:
+            self.message_identifiers.append(message["identifier"])
+            self.spans[message["identifier"]] = tuple(message["span"])
+
+            if message["value_span"]:
+                self.value_spans[message["identifier"]] = tuple(message["value_span"])
+
+        self.message_identifier_set = set(self.message_identifiers)
 
-            self.message_identifiers.append(message.id.name)
+    def read(self):
+        if not os.path.exists(self.path):
+            return ""
 
-    def write_translation(self, base_file, client, config):
-        filtered_messages = base_file.messages_filtered(self.message_identifiers)
+        with open(self.path, "r") as f:
+            return f.read()
+
+    def filter_messages(self, base_file, stale_identifiers):
+        if stale_identifiers:
+            print_warning(
+                f"Retranslating changed messages in {format_value(base_file.name)} "
+                f"for {format_value(self.lang)}:\n"
+                f"{format_list(sorted(stale_identifiers))}"
+            )
+
+        filtered_messages = base_file.messages_filtered(
+            self.message_identifier_set - stale_identifiers
+        )
         if filtered_messages.existing_messages:
             print_warning(
                 f"Skipping already translated messages in {format_value(base_file.name)} "
@@ -35,44 +57,82 @@ class FtlFile:
                 f"for {format_value(self.lang)}:\n"
                 f"{format_list([message.identifier for message in filtered_messages.nested_selection_messages])}"
             )
-        if not filtered_messages.messages:
+
+        return filtered_messages.messages
+
+    def write(self, messages, base_file):
+        edits = [
+            (*self.value_spans[message.identifier], message.value)
+            for message in messages
+            if message.identifier in self.value_spans
+        ]
+
+        insert_positions = self.get_insert_positions(base_file)
+        added_messages = {}
+        for message in messages:
+            if message.identifier not in self.value_spans:
+                added_messages.setdefault(
+                    insert_positions.get(message.identifier), []
+                ).append(message)
+
+        if not edits and not added_messages:
             return
 
-        translate_content = "\n".join(
-            message.get_ftl() for message in filtered_messages.messages
-        )
+        content = self.read()
+        for insert_position, messages in added_messages.items():
+            ftl = "\n".join(message.get_ftl() for message in messages)
 
-        messages = config.get_messages(base_file.body, self.lang, translate_content)
-        response = client.chat.completions.create(
-            model=config.model,
-            messages=messages,
-            response_format={"type": "json_object"},
-        )
+            if insert_position is None:
+                if content and not content.endswith("\n"):
+                    content += "\n"
+                content += ftl + "\n"
+                continue
 
-        translation = json.loads(response.choices[0].message.content)
-        parser = Parser(translation)
+            position, after = insert_position
+            edits.append((position, position, "\n" + ftl if after else ftl + "\n"))
 
-        with open(os.path.join(config.root, self.lang, self.name), "a") as f:
-            f.write(parser.get_ftl())
+        # Applied from the end so that the positions of the earlier edits stay valid, a message added after another
+        # message is inserted before that message's value is replaced
+        for start, end, text in sorted(edits, reverse=True):
+            content = content[:start] + text + content[end:]
 
+        write_atomic(self.path, content)
 
-class BaseFtlFile(FtlFile):
-    def __init__(self, file, lang):
-        super().__init__(file, lang)
+    # New messages go after the closest message before them in the base file that this file has, or before the first
+    # one if there's none, so that the file follows the order of the base file without sorting it
+    def get_insert_positions(self, base_file):
+        insert_positions = {}
 
-        self.body = parse(self.content).body
-        self.messages = []
+        insert_position = next(
+            (
+                (self.spans[identifier][0], False)
+                for identifier in base_file.message_identifiers
+                if identifier in self.spans
+            ),
+            None,
+        )
+        for identifier in base_file.message_identifiers:
+            if identifier in self.spans:
+                insert_position = (self.spans[identifier][1], True)
+            else:
+                insert_positions[identifier] = insert_position
 
-        for message in self.body:
-            if not isinstance(message, Message):
-                continue
+        return insert_positions
 
-            self.messages.append(
-                MessageParser(
-                    ftl_content=self.content,
-                    ftl_message=message,
-                )
-            )
+
+class BaseFtlFile(FtlFile):
+    def __init__(self, path, lang, index):
+        super().__init__(path, lang, index)
+
+        self.content = self.read()
+        self.messages = [
+            MessageParser(ftl_content=self.content, indexed_message=message)
+            for message in self.indexed_messages
+            if message["value_span"]
+        ]
+
+    def get_body(self):
+        return self.index.get_body(self.path)
 
     def messages_filtered(self, identifiers):
         filtered = FilteredMessages([], [], [])
@@ -114,27 +174,41 @@ def get_paths(root):
     return paths
 
 
-def get_base_file_paths(root, base_lang):
+def map_paths(function, paths, jobs):
+    if jobs == 1 or len(paths) <= CHUNK_SIZE:
+        yield from map(function, paths)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(function, paths, chunksize=CHUNK_SIZE)
+
+
+def get_base_file_paths(root, base_lang, index):
     files = []
 
     # noinspection PyTypeChecker
     for filename in os.listdir(os.path.join(root, base_lang)):
         if filename.endswith(".ftl"):
-            with open(os.path.join(root, base_lang, filename), "r") as f:
-                files.append(BaseFtlFile(f, base_lang))
+            files.append(
+                BaseFtlFile(os.path.join(root, base_lang, filename), base_lang, index)
+            )
 
     return files
 
 
-def get_file(path, lang):
-    try:
-        with open(path, "r") as f:
-            file = FtlFile(f, lang)
-    except FileNotFoundError:
-        with open(path, "w+") as f:
-            file = FtlFile(f, lang)
+def get_file(path, lang, index):
+    return FtlFile(path, lang, index)
+
+
+def write_atomic(path, content):
+    with open(path + ".tmp", "w") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
 
-    return file
+    os.replace(path + ".tmp", path)
 
 
 def get_path(root, lang, filename):
@@ -0,0 +1,102 @@
+import json
+import os
+
+from fluent.syntax import parse
+from fluent.syntax.ast import GroupComment, Message
+
+from gpt_ftl.ftl_file import write_atomic
+from gpt_ftl.parser import MessageParser
+
+# Increased whenever the indexed fields change, so that indexes written by older versions are rebuilt
+VERSION = 2
+
+
+class ProjectIndex:
+    def __init__(self, path):
+        self.path = path
+        self.bodies = {}
+        self.changed = False
+
+        try:
+            with open(self.path, "r") as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            index = {}
+
+        self.entries = index["entries"] if index.get("version") == VERSION else {}
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        entry = self.entries.get(path)
+        if (
+            entry
+            and entry["mtime"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        ):
+            return entry["messages"]
+
+        with open(path, "r") as f:
+            content = f.read()
+
+        self.bodies[path] = parse(content).body
+        self.entries[path] = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "messages": index_body(content, self.bodies[path]),
+        }
+        self.changed = True
+
+        return self.entries[path]["messages"]
+
+    def get_body(self, path):
+        path = os.path.abspath(path)
+
+        if path not in self.bodies:
+            with open(path, "r") as f:
+                self.bodies[path] = parse(f.read()).body
+
+        return self.bodies[path]
+
+    def save(self):
+        if not self.changed:
+            return
+
+        write_atomic(
+            self.path, json.dumps({"version": VERSION, "entries": self.entries})
+        )
+
+
+def index_body(content, body):
+    messages = []
+
+    section = 0
+    for elem in body:
+        if isinstance(elem, GroupComment):
+            section += 1
+        if not isinstance(elem, Message):
+            continue
+
+        message = {
+            "identifier": elem.id.name,
+            "span": [elem.span.start, elem.span.end],
+            "value_span": None,
+        }
+
+        if elem.value:
+            parser = MessageParser(ftl_content=content, ftl_message=elem)
+            message.update(
+                value_span=[elem.value.span.start, elem.value.span.end],
+                comments=parser.comments,
+                section=section,
+                nested_selection=parser.contains_nested_selection(),
+            )
+
+        messages.append(message)
+
+    return messages
+
+
+def get_index(config):
+    return ProjectIndex(os.path.join(config.dir, "index.json"))
@@ -0,0 +1,70 @@
+import json
+import os
+
+from gpt_ftl.print_colored import print_error, format_value
+
+
+class Journal:
+    def __init__(self, config):
+        self.path = os.path.join(config.root, "gpt-ftl.journal")
+        self.header = {"base_lang": config.base_lang, "model": config.model}
+        self.done = {}
+        self.resumed = False
+        self.file = None
+
+        if (config.resume or config.batch_id) and os.path.exists(self.path):
+            self.load()
+            self.resumed = True
+
+    # The journal is only opened once something is recorded, so that planning doesn't replace the previous one
+    def open(self):
+        if self.resumed:
+            self.file = open(self.path, "a")
+        else:
+            self.file = open(self.path, "w")
+            self.write({"header": self.header})
+
+    def load(self):
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+
+                if "header" in entry and entry["header"] != self.header:
+                    print_error(
+                        f"The run in {format_value(self.path)} used different settings, run without "
+                        f"{format_value('--resume')} to start over."
+                    )
+                    exit(1)
+                if "file" in entry:
+                    self.done[(entry["file"], entry["lang"])] = entry["translations"]
+
+    def is_done(self, base_file, lang):
+        return (base_file.name, lang) in self.done
+
+    def apply(self, lockfile):
+        for (name, lang), translations in self.done.items():
+            lockfile.set_translations(name, lang, translations)
+
+    def record(self, base_file, file, translations):
+        if not self.file:
+            self.open()
+
+        self.done[(base_file.name, file.lang)] = translations
+        self.write(
+            {"file": base_file.name, "lang": file.lang, "translations": translations}
+        )
+
+    def write(self, entry):
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self, complete):
+        if self.file:
+            self.file.close()
+
+        if complete and os.path.exists(self.path):
+            os.remove(self.path)
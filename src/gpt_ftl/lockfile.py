@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+
+from gpt_ftl.ftl_file import write_atomic
+
+
+class Lockfile:
+    def __init__(self, root):
+        self.path = os.path.join(root, "gpt-ftl.lock")
+
+        try:
+            with open(self.path, "r") as f:
+                self.files = json.load(f)["files"]
+        except FileNotFoundError:
+            self.files = {}
+
+        self.hashes = {}
+
+    def get_file(self, base_file):
+        return self.files.setdefault(
+            base_file.name, {"messages": {}, "translations": {}}
+        )
+
+    def get_hashes(self, base_file):
+        if base_file.name not in self.hashes:
+            self.hashes[base_file.name] = {
+                message.identifier: get_hash(message) for message in base_file.messages
+            }
+
+        return self.hashes[base_file.name]
+
+    # Called when the base file changed since its hashes were computed
+    def forget_hashes(self, base_file):
+        self.hashes.pop(base_file.name, None)
+
+    def get_stale_identifiers(self, base_file, file):
+        translations = self.get_file(base_file)["translations"].get(file.lang, {})
+
+        return {
+            identifier
+            for identifier, hash in self.get_hashes(base_file).items()
+            if identifier in translations
+            and identifier in file.message_identifier_set
+            and translations[identifier] != hash
+        }
+
+    def update(self, base_file, file, translated_identifiers):
+        locked_file = self.get_file(base_file)
+        translations = locked_file["translations"].get(file.lang, {})
+
+        locked_file["messages"] = dict(self.get_hashes(base_file))
+        locked_file["translations"][file.lang] = {
+            identifier: translations.get(identifier, hash)
+            for identifier, hash in locked_file["messages"].items()
+            if identifier in file.message_identifier_set
+        }
+        locked_file["translations"][file.lang].update(
+            (identifier, locked_file["messages"][identifier])
+            for identifier in translated_identifiers
+            if identifier in locked_file["messages"]
+        )
+
+        return locked_file["translations"][file.lang]
+
+    def set_translations(self, name, lang, translations):
+        self.files.setdefault(name, {"messages": {}, "translations": {}})[
+            "translations"
+        ][lang] = translations
+
+    def save(self):
+        write_atomic(
+            self.path,
+            json.dumps({"files": self.files}, indent=2, sort_keys=True) + "\n",
+        )
+
+
+def get_hash(message):
+    content = json.dumps([message.comments, message.value])
+
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
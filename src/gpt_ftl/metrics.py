@@ -0,0 +1,310 @@
+import json
+import os
+
+from gpt_ftl.print_colored import (
+    print_action_done,
+    print_warning,
+    format_value,
+    format_list,
+)
+
+PERCENTILES = [0.5, 0.9, 0.99]
+
+BATCH_DISCOUNT = 0.5
+
+
+class RequestMetric:
+    def __init__(self, name, langs, model):
+        self.name = name
+        self.locale = ",".join(langs)
+        self.model = model
+        self.backend = None
+        self.queue_wait = 0
+        self.latency = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.hedged = False
+        self.hedge_won = False
+        self.sent_at = None
+        self.cost = 0
+        self.error = None
+
+    def set_usage(self, usage, pricing):
+        self.prompt_tokens = usage.prompt_tokens
+        self.completion_tokens = usage.completion_tokens
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        if details and details.cached_tokens:
+            self.cached_tokens = details.cached_tokens
+
+        if pricing:
+            self.cost = get_cost(
+                self.prompt_tokens, self.cached_tokens, self.completion_tokens, pricing
+            )
+
+    def to_json(self):
+        return {
+            "name": self.name,
+            "locale": self.locale,
+            "model": self.model,
+            "backend": self.backend,
+            "queue_wait": self.queue_wait,
+            "latency": self.latency,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "retries": self.retries,
+            "hedged": self.hedged,
+            "hedge_won": self.hedge_won,
+            "cost": self.cost,
+            "error": self.error,
+        }
+
+
+class Metrics:
+    def __init__(self, config):
+        self.pricing = config["pricing"]
+        self.requests = []
+        self.unpriced_models = set()
+
+    def start(self, name, langs, model):
+        metric = RequestMetric(name, langs, model)
+        self.requests.append(metric)
+
+        if model not in self.pricing and model not in self.unpriced_models:
+            self.unpriced_models.add(model)
+            print_warning(
+                f"No pricing configured for {format_value(model)}, its cost won't be estimated. Add it to the "
+                f"{format_value('pricing')} table of the configuration file."
+            )
+
+        return metric
+
+    def total(self, attribute, requests=None):
+        return sum(getattr(request, attribute) for request in requests or self.requests)
+
+    def cache_hit_rate(self):
+        prompt_tokens = self.total("prompt_tokens")
+        if not prompt_tokens:
+            return 0
+
+        return self.total("cached_tokens") / prompt_tokens
+
+    def by_locale(self):
+        locales = {}
+        for request in self.requests:
+            locales.setdefault(request.locale, []).append(request)
+
+        return locales
+
+    def print_summary(self):
+        if not self.requests:
+            return
+
+        failed = [request for request in self.requests if request.error]
+        cost = f"${self.total('cost'):.4f}"
+        print_action_done(
+            f"Made {format_value(str(len(self.requests)))} requests ({len(failed)} failed, "
+            f"{self.total('retries')} retries) using {self.total('prompt_tokens')} prompt tokens "
+            f"({self.total('cached_tokens')} cached, {self.cache_hit_rate():.0%} prompt cache hit rate) and "
+            f"{self.total('completion_tokens')} completion tokens, estimated cost {format_value(cost)}.\n"
+            f"Latency {format_percentiles([request.latency for request in self.requests])}, "
+            f"queue wait {format_percentiles([request.queue_wait for request in self.requests])}"
+        )
+
+        hedged = self.total("hedged")
+        if hedged:
+            print_action_done(
+                f"Sent a duplicate of {hedged} slow requests, the duplicate finished first for "
+                f"{self.total('hedge_won')} of them."
+            )
+
+        lines = []
+        for locale, requests in sorted(self.by_locale().items()):
+            cost = f"${self.total('cost', requests):.4f}"
+            lines.append(
+                f"{locale}: {len(requests)} requests, latency "
+                f"{format_percentiles([request.latency for request in requests])}, "
+                f"{self.total('prompt_tokens', requests) + self.total('completion_tokens', requests)} tokens, "
+                f"{cost}"
+            )
+        print_action_done(f"Requests by language:\n{format_list(lines)}")
+
+        models = self.by_model()
+        if len(models) > 1:
+            lines = [
+                f"{model}: {len(requests)} requests "
+                f"({len([request for request in requests if request.error])} failed, "
+                f"{self.total('retries', requests)} retries), latency "
+                f"{format_percentiles([request.latency for request in requests])}, "
+                f"{self.total('prompt_tokens', requests) + self.total('completion_tokens', requests)} tokens, "
+                f"${self.total('cost', requests):.4f}"
+                for model, requests in sorted(models.items())
+            ]
+            print_action_done(f"Requests by model:\n{format_list(lines)}")
+
+        backends = self.by_backend()
+        if len(backends) > 1:
+            lines = [
+                f"{backend}: {len(requests)} requests "
+                f"({len([request for request in requests if request.error])} failed), latency "
+                f"{format_percentiles([request.latency for request in requests])}"
+                for backend, requests in sorted(backends.items())
+            ]
+            print_action_done(f"Requests by backend:\n{format_list(lines)}")
+
+    def by_model(self):
+        models = {}
+        for request in self.requests:
+            models.setdefault(request.model, []).append(request)
+
+        return models
+
+    def by_backend(self):
+        backends = {}
+        for request in self.requests:
+            if request.backend:
+                backends.setdefault(request.backend, []).append(request)
+
+        return backends
+
+    def write(self, path):
+        os.makedirs(path, exist_ok=True)
+
+        with open(os.path.join(path, "metrics.jsonl"), "w") as f:
+            for request in self.requests:
+                f.write(json.dumps(request.to_json()) + "\n")
+
+        with open(os.path.join(path, "metrics.prom"), "w") as f:
+            f.write(self.get_prometheus())
+
+        print_action_done(f"Wrote request metrics to {format_value(path)}.")
+
+    def get_prometheus(self):
+        lines = []
+
+        def add(name, kind, help, samples):
+            lines.append(f"# HELP gpt_ftl_{name} {help}")
+            lines.append(f"# TYPE gpt_ftl_{name} {kind}")
+            for labels, value in samples:
+                label = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"gpt_ftl_{name}{{{label}}} {value}")
+
+        locales = sorted(self.by_locale().items())
+
+        add(
+            "requests_total",
+            "counter",
+            "API requests made.",
+            [
+                (
+                    {"locale": locale, "status": status},
+                    len([r for r in requests if bool(r.error) == (status == "error")]),
+                )
+                for locale, requests in locales
+                for status in ("ok", "error")
+            ],
+        )
+        add(
+            "retries_total",
+            "counter",
+            "API requests retried.",
+            [
+                ({"locale": locale}, self.total("retries", requests))
+                for locale, requests in locales
+            ],
+        )
+        add(
+            "hedged_total",
+            "counter",
+            "Slow API requests that were sent again, and how many of them the duplicate finished first.",
+            [
+                (
+                    {"locale": locale, "winner": winner},
+                    len(
+                        [
+                            r
+                            for r in requests
+                            if r.hedged and r.hedge_won == (winner == "duplicate")
+                        ]
+                    ),
+                )
+                for locale, requests in locales
+                for winner in ("original", "duplicate")
+            ],
+        )
+        add(
+            "tokens_total",
+            "counter",
+            "Tokens used.",
+            [
+                (
+                    {"locale": locale, "type": kind},
+                    self.total(f"{kind}_tokens", requests),
+                )
+                for locale, requests in locales
+                for kind in ("prompt", "cached", "completion")
+            ],
+        )
+        add(
+            "cost_dollars_total",
+            "counter",
+            "Estimated cost in US dollars.",
+            [
+                ({"locale": locale}, self.total("cost", requests))
+                for locale, requests in locales
+            ],
+        )
+
+        for name, attribute, help in (
+            ("request_latency_seconds", "latency", "API request latency."),
+            (
+                "queue_wait_seconds",
+                "queue_wait",
+                "Time requests waited before being sent.",
+            ),
+        ):
+            values = [getattr(request, attribute) for request in self.requests]
+            add(
+                name,
+                "summary",
+                help,
+                [({"quantile": str(q)}, percentile(values, q)) for q in PERCENTILES],
+            )
+            lines.append(f"gpt_ftl_{name}_sum {sum(values)}")
+            lines.append(f"gpt_ftl_{name}_count {len(values)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def get_pricing(config, model):
+    pricing = config["pricing"].get(model)
+    if pricing and (config.batch or config.batch_id):
+        pricing = {key: price * BATCH_DISCOUNT for key, price in pricing.items()}
+
+    return pricing
+
+
+def get_cost(prompt_tokens, cached_tokens, completion_tokens, pricing):
+    return (
+        (prompt_tokens - cached_tokens) * pricing["input"]
+        + cached_tokens * pricing.get("cached_input", pricing["input"])
+        + completion_tokens * pricing["output"]
+    ) / 1_000_000
+
+
+def percentile(values, q):
+    if not values:
+        return 0
+
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def format_percentiles(values):
+    return (
+        "/".join(f"{percentile(values, q):.2f}" for q in PERCENTILES)
+        + "s (p50/p90/p99)"
+    )
@@ -1,25 +1,35 @@
-from fluent.syntax.ast import SelectExpression, Placeable
-
-
 class Parser:
     def __init__(self, json):
         self.messages = [MessageParser(message) for message in json.items()]
 
+    def sort(self, identifiers):
+        positions = {identifier: i for i, identifier in enumerate(identifiers)}
+
+        self.messages.sort(
+            key=lambda message: positions.get(message.identifier, len(positions))
+        )
+
     def get_ftl(self):
         return "\n".join(message.get_ftl() for message in self.messages) + "\n"
 
 
 class MessageParser:
-    def __init__(self, json=None, ftl_content=None, ftl_message=None):
+    def __init__(
+        self, json=None, ftl_content=None, ftl_message=None, indexed_message=None
+    ):
         self.identifier = None
         self.value = None
         self.comments = None
         self.ftl_message = None
+        self.section = None
+        self.nested_selection = False
 
         if json:
             self.init_from_json(json)
-        if ftl_content:
+        if ftl_content and ftl_message:
             self.init_from_ftl(ftl_content, ftl_message)
+        if ftl_content is not None and indexed_message:
+            self.init_from_index(ftl_content, indexed_message)
 
     def init_from_json(self, json):
         self.identifier = json[0]
@@ -33,20 +43,33 @@ class MessageParser:
             self.value = SelectionParser(json_val).get_ftl()
 
     def init_from_ftl(self, content, message):
+        from fluent.syntax.ast import SelectExpression, Placeable
+
         self.identifier = message.id.name
         self.value = content[message.value.span.start : message.value.span.end]
         self.comments = message.comment.content if message.comment else None
         self.ftl_message = message
 
-    def contains_nested_selection(self):
-        for i, elem in enumerate(self.ftl_message.value.elements):
+        for i, elem in enumerate(message.value.elements):
             if i == 0:
                 continue
 
             if isinstance(elem, Placeable) and isinstance(
                 elem.expression, SelectExpression
             ):
-                return True
+                self.nested_selection = True
+
+    def init_from_index(self, content, message):
+        start, end = message["value_span"]
+
+        self.identifier = message["identifier"]
+        self.value = content[start:end]
+        self.comments = message["comments"]
+        self.section = message["section"]
+        self.nested_selection = message["nested_selection"]
+
+    def contains_nested_selection(self):
+        return self.nested_selection
 
     def get_ftl(self):
         ftl = ""
@@ -68,12 +91,11 @@ class SelectionParser:
     def collapse(self):
         default_translation = self.default().translation
 
-        for i, variant in enumerate(self.variants.copy()):
-            if variant.is_default:
-                continue
-
-            if variant.translation == default_translation:
-                self.variants.pop(i)
+        self.variants = [
+            variant
+            for variant in self.variants
+            if variant.is_default or variant.translation != default_translation
+        ]
 
     def default(self):
         return next(variant for variant in self.variants if variant.is_default)
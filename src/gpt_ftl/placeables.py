@@ -0,0 +1,195 @@
+import re
+
+from gpt_ftl.parser import MessageParser
+
+TOKEN = re.compile(r"\{\s*(\d+)\s*\}")
+VARIANT_KEY = re.compile(r"^\s*(\*?)\[\s*([^\]]*?)\s*\]", re.MULTILINE)
+
+
+class PlaceableError(ValueError):
+    pass
+
+
+# Placeables are replaced with numbered tokens such as {0} before they're sent, which makes the prompt shorter and
+# lets the response be checked by only counting the tokens. Select expressions are kept so that the variants can be
+# translated, but the placeables inside their variants are replaced too.
+def mask_message(message):
+    placeables = []
+    masked = MessageParser(json=(message.identifier, mask(message.value, placeables)))
+    masked.comments = message.comments
+
+    return masked, placeables
+
+
+def mask(text, placeables):
+    masked = []
+    position = 0
+
+    while True:
+        start = text.find("{", position)
+        if start == -1:
+            break
+
+        end = find_placeable_end(text, start)
+        masked.append(text[position:start])
+
+        arrow = find_select_arrow(text, start, end)
+        if arrow is None:
+            masked.append(f"{{{len(placeables)}}}")
+            placeables.append(text[start : end + 1])
+        else:
+            masked.append(text[start : arrow + 2])
+            masked.append(mask(text[arrow + 2 : end], placeables))
+            masked.append("}")
+
+        position = end + 1
+
+    masked.append(text[position:])
+    return "".join(masked)
+
+
+# Returns the selector of a message that is a single select expression, such as $count, which translations of the
+# message have to be a list of variants for
+def get_selector(text):
+    start = len(text) - len(text.lstrip())
+    if not text.startswith("{", start):
+        return None
+
+    end = find_placeable_end(text, start)
+    arrow = find_select_arrow(text, start, end)
+    if arrow is None or text[end + 1 :].strip():
+        return None
+
+    return text[start + 1 : arrow].strip()
+
+
+# Returns the keys of the variants of a message that is a single select expression and the key of its default variant,
+# placeables inside the variants are skipped so that only the keys of the outer selection are found
+def get_variant_keys(text):
+    start = len(text) - len(text.lstrip())
+    end = find_placeable_end(text, start)
+
+    outer = []
+    position = find_select_arrow(text, start, end) + 2
+    while position < end:
+        nested = text.find("{", position, end)
+        if nested == -1:
+            nested = end
+
+        outer.append(text[position:nested])
+        position = find_placeable_end(text, nested) + 1 if nested < end else end
+
+    keys = []
+    default = None
+    for star, key in VARIANT_KEY.findall("".join(outer)):
+        keys.append(key)
+        if star:
+            default = key
+
+    return keys, default
+
+
+def find_placeable_end(text, start):
+    depth = 0
+    in_string = False
+
+    position = start
+    while position < len(text):
+        char = text[position]
+
+        if in_string:
+            if char == "\\":
+                position += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return position
+
+        position += 1
+
+    return len(text) - 1
+
+
+def find_select_arrow(text, start, end):
+    depth = 0
+    in_string = False
+
+    position = start + 1
+    while position < end:
+        char = text[position]
+
+        if in_string:
+            if char == "\\":
+                position += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif depth == 0 and text.startswith("->", position):
+            return position
+
+        position += 1
+
+    return None
+
+
+# A translation with a token missing, repeated or made up is rejected. Variants of a selection may each repeat the
+# same placeable, so only the whole selection has to contain every token.
+def unmask(value, placeables):
+    if isinstance(value, list):
+        used = set()
+        for variant in value:
+            if isinstance(variant, dict) and isinstance(
+                variant.get("translation"), str
+            ):
+                used.update(check_tokens(variant["translation"], placeables))
+                variant["translation"] = replace_tokens(
+                    variant["translation"], placeables
+                )
+
+        check_missing(used, placeables)
+        return value
+
+    if not isinstance(value, str):
+        return value
+
+    check_missing(check_tokens(value, placeables), placeables)
+    return replace_tokens(value, placeables)
+
+
+def check_tokens(text, placeables):
+    tokens = [int(token) for token in TOKEN.findall(text)]
+
+    unknown = [token for token in tokens if token >= len(placeables)]
+    if unknown:
+        raise PlaceableError(f"Unknown placeable {{{unknown[0]}}}")
+
+    duplicated = {token for token in tokens if tokens.count(token) > 1}
+    if duplicated:
+        raise PlaceableError(
+            f"Placeable {placeables[min(duplicated)]} is repeated in the translation"
+        )
+
+    return set(tokens)
+
+
+def check_missing(used, placeables):
+    missing = [i for i in range(len(placeables)) if i not in used]
+    if missing:
+        raise PlaceableError(
+            f"Placeable {placeables[missing[0]]} is missing from the translation"
+        )
+
+
+def replace_tokens(text, placeables):
+    return TOKEN.sub(lambda match: placeables[int(match.group(1))], text)
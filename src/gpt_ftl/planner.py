@@ -0,0 +1,339 @@
+import json
+
+from gpt_ftl.cache import get_key
+from gpt_ftl.chunker import chunk_messages
+from gpt_ftl.metrics import get_cost, get_pricing
+from gpt_ftl.parser import MessageParser
+from gpt_ftl.placeables import mask_message
+from gpt_ftl.routing import get_route, get_routes
+from gpt_ftl.print_colored import (
+    print_action_done,
+    format_value,
+    format_list,
+)
+from gpt_ftl.scheduler import estimate_completion_tokens, estimate_messages_tokens
+
+
+class Planner:
+    def __init__(self, memory, lockfile, config):
+        self.memory = memory
+        self.lockfile = lockfile
+        self.config = config
+        self.system_messages = {}
+        self.shares = {}
+        self.comments = {}
+        self.routes = get_routes(config)
+
+    def get_system_messages(self, base_file):
+        if base_file.name not in self.system_messages:
+            self.system_messages[base_file.name] = self.config.get_system_messages(
+                base_file.get_body()
+            )
+
+        return self.system_messages[base_file.name]
+
+    # Targets of every unit are planned before any request, so that identical strings can be requested once with
+    # the comments of all of them as context
+    def plan(self, units):
+        units = [self.plan_targets(base_file, files) for base_file, files in units]
+        for unit in units:
+            self.plan_requests(unit)
+
+        return Plan(units, self.config)
+
+    def plan_targets(self, base_file, files):
+        unit = Unit(base_file, files)
+        user_prompt = self.config.get_user_prompt([file.lang for file in files])
+
+        for file in files:
+            messages = file.filter_messages(
+                base_file, self.lockfile.get_stale_identifiers(base_file, file)
+            )
+            if not messages:
+                unit.skipped.append(file)
+                continue
+
+            # The AST of the base file is only parsed if it has messages to translate
+            system_messages = unit.system_messages = self.get_system_messages(base_file)
+
+            target = Target(file)
+            for message in messages:
+                route = get_route(message, self.routes, self.config)
+                key = get_key(
+                    message, file.lang, route.model, system_messages, user_prompt
+                )
+                target.keys[message.identifier] = key
+
+                value = self.memory.get(key)
+                if value is not None:
+                    target.cached_messages.append(
+                        MessageParser(json=(message.identifier, value))
+                    )
+                    continue
+
+                comments = self.comments.setdefault(message.value, [])
+                if message.comments and message.comments not in comments:
+                    comments.append(message.comments)
+
+                share_key = self.get_share_key(message, file.lang)
+                if share_key in self.shares:
+                    target.shared[message.identifier] = self.shares[share_key]
+                    continue
+
+                target.untranslated.add(message.identifier)
+                target.shares[message.identifier] = self.shares[share_key] = Share(unit)
+
+            unit.targets[file.lang] = target
+
+        return unit
+
+    # Messages are grouped by the languages that need them, so that a request doesn't ask for translations that are
+    # already in the translation memory, shared or up to date
+    def plan_requests(self, unit):
+        groups = {}
+        for message in unit.base_file.messages:
+            langs = tuple(
+                lang
+                for lang, target in unit.targets.items()
+                if message.identifier in target.untranslated
+            )
+            if langs:
+                groups.setdefault(langs, []).append(message)
+
+        for langs, untranslated_messages in groups.items():
+            for route in self.routes.values():
+                messages = [
+                    self.add_context(message)
+                    for message in untranslated_messages
+                    if get_route(message, self.routes, self.config) is route
+                ]
+                if messages:
+                    self.plan_route(unit, route, list(langs), messages)
+
+    def plan_route(self, unit, route, langs, messages):
+        chunks = chunk_messages(messages, self.config.chunk_tokens // len(langs))
+        for i, chunk in enumerate(chunks):
+            name = (
+                f"{unit.base_file.name} to {', '.join(langs)} ({i + 1}/{len(chunks)})"
+            )
+            if len(self.routes) > 1:
+                name = f"{name} ({route.name})"
+
+            request = create_request(
+                name, langs, chunk, unit.system_messages, self.config, route.model
+            )
+            unit.requests.append(request)
+
+            for lang in langs:
+                for identifier in request.sources:
+                    share = unit.targets[lang].shares.get(identifier)
+                    if share:
+                        share.request = request
+
+    def get_share_key(self, message, lang):
+        if self.config.separate_comments:
+            return lang, message.value, message.comments
+
+        return lang, message.value
+
+    # Strings shared by messages with different comments are sent with all of their comments
+    def add_context(self, message):
+        comments = self.comments.get(message.value, [])
+        if self.config.separate_comments or len(comments) < 2:
+            return message
+
+        shared = MessageParser(json=(message.identifier, message.value))
+        shared.comments = "\n".join(comments)
+        return shared
+
+
+class Plan:
+    def __init__(self, units, config):
+        self.units = units
+        self.model = config.model
+        self.pricing = {
+            route.model: get_pricing(config, route.model)
+            for route in get_routes(config).values()
+        }
+
+    def requests(self):
+        return [request for unit in self.units for request in unit.requests]
+
+    def total(self, attribute):
+        return sum(getattr(request, attribute) for request in self.requests())
+
+    def cost(self, requests=None):
+        requests = self.requests() if requests is None else requests
+        if any(not self.pricing.get(request.model) for request in requests):
+            return None
+
+        return sum(
+            get_cost(
+                request.prompt_tokens,
+                0,
+                request.completion_tokens,
+                self.pricing[request.model],
+            )
+            for request in requests
+        )
+
+    def print_summary(self):
+        targets = [target for unit in self.units for target in unit.targets.values()]
+        cost = self.cost()
+
+        print_action_done(
+            f"Planned {format_value(str(len(self.requests())))} requests for "
+            f"{sum(len(target.untranslated) for target in targets)} messages to translate "
+            f"({sum(len(target.cached_messages) for target in targets)} more from the translation memory and "
+            f"{sum(len(target.shared) for target in targets)} more shared with identical strings), "
+            f"estimated {self.total('prompt_tokens')} prompt tokens and {self.total('completion_tokens')} completion "
+            f"tokens"
+            + (
+                f", estimated cost {format_value(f'${cost:.4f}')}."
+                if cost is not None
+                else f", no pricing is configured for "
+                f"{format_value(', '.join(model for model, pricing in self.pricing.items() if not pricing))} to "
+                f"estimate the cost."
+            )
+        )
+
+        lines = []
+        for locale, requests in sorted(self.by_locale().items()):
+            cost = self.cost(requests)
+            lines.append(
+                f"{locale}: {len(requests)} requests, "
+                f"{sum(request.prompt_tokens + request.completion_tokens for request in requests)} tokens"
+                + (f", ${cost:.4f}" if cost is not None else "")
+            )
+        if lines:
+            print_action_done(f"Requests by language:\n{format_list(lines)}")
+
+        # Shows how the routing rules split the messages, to tune them
+        if len(self.pricing) > 1:
+            lines = []
+            for model, requests in sorted(self.by_model().items()):
+                cost = self.cost(requests)
+                lines.append(
+                    f"{model}: {len(requests)} requests, "
+                    f"{sum(len(request.sources) * len(request.langs) for request in requests)} messages, "
+                    f"{sum(request.prompt_tokens + request.completion_tokens for request in requests)} tokens"
+                    + (f", ${cost:.4f}" if cost is not None else "")
+                )
+            if lines:
+                print_action_done(f"Requests by model:\n{format_list(lines)}")
+
+    def by_model(self):
+        models = {}
+        for request in self.requests():
+            models.setdefault(request.model, []).append(request)
+
+        return models
+
+    def by_locale(self):
+        locales = {}
+        for request in self.requests():
+            locales.setdefault(",".join(request.langs), []).append(request)
+
+        return locales
+
+    def to_json(self):
+        return {
+            "model": self.model,
+            "total": {
+                "requests": len(self.requests()),
+                "prompt_tokens": self.total("prompt_tokens"),
+                "completion_tokens": self.total("completion_tokens"),
+                "cost": self.cost(),
+            },
+            "files": [
+                {
+                    "file": unit.base_file.name,
+                    "lang": lang,
+                    "untranslated": sorted(target.untranslated),
+                    "cached": [
+                        message.identifier for message in target.cached_messages
+                    ],
+                    "shared": sorted(target.shared),
+                }
+                for unit in self.units
+                for lang, target in unit.targets.items()
+            ],
+            "requests": [
+                {
+                    "name": request.name,
+                    "locale": ",".join(request.langs),
+                    "model": request.model,
+                    "messages": len(request.sources),
+                    "prompt_tokens": request.prompt_tokens,
+                    "completion_tokens": request.completion_tokens,
+                    "cost": self.cost([request]),
+                }
+                for request in self.requests()
+            ],
+        }
+
+    def write(self, path):
+        with open(path, "w") as f:
+            f.write(json.dumps(self.to_json(), indent=2) + "\n")
+
+        print_action_done(f"Wrote the plan to {format_value(path)}.")
+
+
+class Unit:
+    def __init__(self, base_file, files):
+        self.base_file = base_file
+        self.files = files
+        self.system_messages = None
+        self.name = f"{base_file.name} to {', '.join(file.lang for file in files)}"
+        self.targets = {}
+        self.skipped = []
+        self.requests = []
+
+
+# Messages in shares are translated by this target and copied to the targets of identical strings, messages in
+# shared are copied from the share of another target
+class Target:
+    def __init__(self, file):
+        self.file = file
+        self.keys = {}
+        self.cached_messages = []
+        self.untranslated = set()
+        self.shares = {}
+        self.shared = {}
+
+
+class Share:
+    def __init__(self, unit):
+        self.unit = unit
+        self.request = None
+        self.value = None
+
+
+class Request:
+    def __init__(
+        self, name, langs, sources, placeables, messages, completion_tokens, model
+    ):
+        self.name = name
+        self.langs = langs
+        self.sources = sources
+        self.placeables = placeables
+        self.messages = messages
+        self.prompt_tokens = estimate_messages_tokens(messages)
+        self.completion_tokens = completion_tokens
+        self.model = model
+
+
+# Requests without a model, such as repairs, go to --model
+def create_request(name, langs, messages, system_messages, config, model=None):
+    masked_messages = [mask_message(message) for message in messages]
+    translate_content = "\n".join(message.get_ftl() for message, _ in masked_messages)
+
+    return Request(
+        name,
+        langs,
+        {message.identifier: message for message in messages},
+        {message.identifier: placeables for message, placeables in masked_messages},
+        config.get_messages(system_messages, langs, translate_content),
+        estimate_completion_tokens(translate_content) * len(langs),
+        model or config.model,
+    )
@@ -0,0 +1,43 @@
+from gpt_ftl.placeables import mask
+
+
+class Route:
+    def __init__(self, name, model, jobs):
+        self.name = name
+        self.model = model
+        self.jobs = jobs
+
+
+# Messages are routed to the simple route only if a simple model is configured, the complex route uses --model. Routes
+# without jobs can send as many requests at a time as the backends take.
+def get_routes(config):
+    routes = {"complex": Route("complex", config.model, None)}
+
+    routing = config["routing"]
+    if routing["simple_model"]:
+        routes["simple"] = Route(
+            "simple", routing["simple_model"], routing["simple_jobs"] or None
+        )
+
+    return routes
+
+
+def get_route(message, routes, config):
+    if "simple" in routes and is_simple(message, config["routing"]):
+        return routes["simple"]
+
+    return routes["complex"]
+
+
+# Uses the same placeables that are masked in the prompt, select expressions are kept when masking so their arrow
+# shows that the message has one
+def is_simple(message, rules):
+    placeables = []
+    masked = mask(message.value, placeables)
+
+    return (
+        len(message.value) <= rules["max_length"]
+        and len(placeables) <= rules["max_placeables"]
+        and (rules["selections"] or "->" not in masked)
+        and (rules["comments"] or not message.comments)
+    )
@@ -0,0 +1,495 @@
+import asyncio
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+
+from gpt_ftl.metrics import percentile
+from gpt_ftl.print_colored import print_warning, print_action_done, format_value
+from gpt_ftl.routing import get_routes
+
+RETRYABLE_ERRORS = (APIConnectionError, InternalServerError, RateLimitError)
+
+BASE_BACKOFF = 1
+MAX_BACKOFF = 60
+
+# A backend of a pool is drained after this many connection or server errors in a row, and tried again after a
+# cooldown that doubles each time it fails again
+UNHEALTHY_FAILURES = 3
+BASE_COOLDOWN = 5
+MAX_COOLDOWN = 300
+
+# Requests are only hedged once enough of them finished to estimate the latency percentile
+HEDGE_MIN_SAMPLES = 10
+HEDGE_CHECK_INTERVAL = 1
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.capacity / 60
+        )
+        self.updated = now
+
+    async def acquire(self, amount):
+        amount = min(amount, self.capacity)
+
+        async with self.lock:
+            while True:
+                self.refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+
+                await asyncio.sleep((amount - self.tokens) * 60 / self.capacity)
+
+    def adjust(self, amount):
+        self.refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class Backend:
+    def __init__(self, name, client, model, jobs, rpm, tpm, drain):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.jobs = jobs
+        self.semaphore = asyncio.Semaphore(jobs)
+        self.rpm = TokenBucket(rpm) if rpm else None
+        self.tpm = TokenBucket(tpm) if tpm else None
+        self.drain = drain
+        self.resume_at = 0
+        self.in_flight = 0
+        self.failures = 0
+        self.unhealthy_until = 0
+
+    def load(self):
+        return self.in_flight / self.jobs
+
+    def available_at(self):
+        return max(self.resume_at, self.unhealthy_until)
+
+    async def admit(self, tokens):
+        if self.rpm:
+            await self.rpm.acquire(1)
+        if self.tpm:
+            await self.tpm.acquire(tokens)
+
+    def succeeded(self):
+        if self.drain and self.failures >= UNHEALTHY_FAILURES:
+            print_action_done(
+                f"{format_value(self.name)} is responding again, sending requests to it."
+            )
+
+        self.failures = 0
+        self.unhealthy_until = 0
+
+    # Only backends of a pool are drained, a single backend is retried with backoff as usual
+    def failed(self):
+        self.failures += 1
+        if not self.drain or self.failures < UNHEALTHY_FAILURES:
+            return
+
+        cooldown = min(
+            MAX_COOLDOWN, BASE_COOLDOWN * 2 ** (self.failures - UNHEALTHY_FAILURES)
+        )
+        self.unhealthy_until = time.monotonic() + cooldown
+        print_warning(
+            f"Not sending requests to {format_value(self.name)} for {cooldown} seconds after {self.failures} "
+            f"failures in a row."
+        )
+
+
+# Duplicates of hedged requests aren't limited by --jobs, they would wait for the slot of the request they duplicate
+# while it stalls, --hedge-budget limits how many are sent instead
+class Unlimited:
+    async def __aenter__(self):
+        pass
+
+    async def __aexit__(self, *args):
+        pass
+
+
+UNLIMITED = Unlimited()
+
+
+class Scheduler:
+    def __init__(self, metrics, config):
+        self.metrics = metrics
+        self.max_retries = config.max_retries
+        self.backends = get_backends(config)
+        self.semaphores = {
+            route.model: asyncio.Semaphore(route.jobs or get_jobs(config))
+            for route in get_routes(config).values()
+        }
+        self.hedge_percentile = config.hedge_percentile
+        self.hedge_budget = config.hedge_budget
+        self.hedged = 0
+
+    async def close(self):
+        for backend in self.backends:
+            await backend.client.close()
+
+    # Waits for a backend that isn't rate limited or drained, and picks the one with the fewest requests relative to
+    # its concurrency
+    async def pick(self, avoid=None):
+        while True:
+            now = time.monotonic()
+
+            available = [
+                backend for backend in self.backends if backend.available_at() <= now
+            ]
+            if available:
+                return min(
+                    [backend for backend in available if backend.name != avoid]
+                    or available,
+                    key=Backend.load,
+                )
+
+            await asyncio.sleep(
+                min(backend.available_at() for backend in self.backends) - now
+            )
+
+    async def request(
+        self, model, messages, completion_tokens, name, langs, listener=None
+    ):
+        metric = self.metrics.start(name, langs, model)
+
+        try:
+            return await self.request_with_retries(
+                model, messages, completion_tokens, name, listener, metric
+            )
+        except Exception as e:
+            metric.error = str(e) or type(e).__name__
+            raise
+
+    async def request_with_retries(
+        self, model, messages, completion_tokens, name, listener, metric
+    ):
+        tokens = estimate_messages_tokens(messages) + completion_tokens
+
+        for attempt in range(self.max_retries + 1):
+            metric.retries = attempt
+
+            try:
+                backend, (content, usage) = await self.hedge(
+                    model, messages, tokens, listener, metric
+                )
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+
+                delay = backoff(attempt)
+                retry_after = get_retry_after(e)
+                if retry_after is not None:
+                    delay = retry_after + random.uniform(0, BASE_BACKOFF)
+
+                print_warning(
+                    f"Retrying {format_value(name)} in {delay:.1f} seconds "
+                    f"({attempt + 1}/{self.max_retries}): {e}"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            if usage:
+                metric.set_usage(
+                    usage, self.metrics.pricing.get(backend.model or model)
+                )
+
+                if backend.tpm:
+                    backend.tpm.adjust(usage.total_tokens - tokens)
+
+            return content
+
+    # Sends a duplicate of a request that takes longer than the hedge percentile of this run's latencies, preferably
+    # to another backend, and uses whichever finishes first. The duplicate isn't streamed, its response is fed to the
+    # listener if it wins, which keeps the messages the original already streamed.
+    async def hedge(self, model, messages, tokens, listener, metric):
+        started_at = time.monotonic()
+        original = asyncio.ensure_future(
+            self.attempt(model, messages, tokens, listener, metric, started_at)
+        )
+
+        if not self.hedge_percentile:
+            return await original
+
+        # The threshold and budget are checked again while waiting, as requests that finish change them. Latencies don't
+        # include waiting to be sent, so neither does the time the request has taken.
+        metric.sent_at = None
+        while True:
+            threshold = self.get_hedge_threshold(model)
+            elapsed = time.monotonic() - metric.sent_at if metric.sent_at else 0
+            if (
+                threshold is not None
+                and elapsed >= threshold
+                and self.hedged < self.hedge_budget * len(self.metrics.requests)
+            ):
+                break
+
+            timeout = HEDGE_CHECK_INTERVAL
+            if threshold is not None and elapsed < threshold:
+                timeout = min(timeout, threshold - elapsed)
+
+            try:
+                return await asyncio.wait_for(asyncio.shield(original), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        self.hedged += 1
+        metric.hedged = True
+        duplicate = asyncio.ensure_future(
+            self.attempt(
+                model,
+                messages,
+                tokens,
+                None,
+                None,
+                time.monotonic(),
+                metric.backend,
+                True,
+            )
+        )
+
+        pending = {original, duplicate}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    if task.exception():
+                        continue
+
+                    if task is duplicate:
+                        metric.hedge_won = True
+                        metric.latency = time.monotonic() - metric.sent_at
+                        if listener:
+                            listener.start()
+                            listener.feed(task.result()[1][0])
+
+                    return task.result()
+
+            raise original.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def get_hedge_threshold(self, model):
+        latencies = [
+            request.latency
+            for request in self.metrics.requests
+            if request.model == model and request.latency and not request.error
+        ]
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+
+        return percentile(latencies, self.hedge_percentile / 100)
+
+    # Sends the request once to the least loaded backend, avoiding the given one if another is available
+    async def attempt(
+        self,
+        model,
+        messages,
+        tokens,
+        listener,
+        metric,
+        queued_at,
+        avoid=None,
+        duplicate=False,
+    ):
+        async with UNLIMITED if duplicate else self.semaphores[model]:
+            backend = await self.pick(avoid)
+            if metric:
+                metric.backend = backend.name
+
+            try:
+                result = await self.send(
+                    backend,
+                    model,
+                    messages,
+                    tokens,
+                    listener,
+                    metric,
+                    queued_at,
+                    duplicate,
+                )
+            except RETRYABLE_ERRORS as e:
+                if not isinstance(e, RateLimitError):
+                    backend.failed()
+
+                retry_after = get_retry_after(e)
+                if retry_after is not None:
+                    backend.resume_at = max(
+                        backend.resume_at, time.monotonic() + retry_after
+                    )
+
+                raise
+
+            backend.succeeded()
+            return backend, result
+
+    async def send(
+        self, backend, model, messages, tokens, listener, metric, queued_at, duplicate
+    ):
+        model = backend.model or model
+
+        backend.in_flight += 1
+        try:
+            await backend.admit(tokens)
+
+            async with UNLIMITED if duplicate else backend.semaphore:
+                started_at = time.monotonic()
+                if metric:
+                    metric.queue_wait += started_at - queued_at
+                    metric.sent_at = started_at
+
+                if listener:
+                    result = await self.create_streamed(
+                        backend.client, model, messages, listener
+                    )
+                else:
+                    result = await self.create(backend.client, model, messages)
+
+                if metric:
+                    metric.latency = time.monotonic() - started_at
+                return result
+        finally:
+            backend.in_flight -= 1
+
+    async def create(self, client, model, messages):
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format={"type": "json_object"},
+        )
+
+        return response.choices[0].message.content, response.usage
+
+    async def create_streamed(self, client, model, messages, listener):
+        listener.start()
+
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format={"type": "json_object"},
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+        content = []
+        usage = None
+        async for chunk in response:
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+
+            content.append(chunk.choices[0].delta.content)
+            listener.feed(chunk.choices[0].delta.content)
+
+        return "".join(content), usage
+
+
+# Backends configured in the configuration file replace the API given with --base-url and --api-key
+def get_backends(config):
+    backends = config.toml.get("backends", [])
+    if not backends:
+        return [
+            Backend(
+                "default",
+                AsyncOpenAI(
+                    api_key=config.api_key, base_url=config.base_url, max_retries=0
+                ),
+                None,
+                config.jobs,
+                config.rpm,
+                config.tpm,
+                False,
+            )
+        ]
+
+    return [
+        Backend(
+            backend.get("name", backend["base_url"]),
+            AsyncOpenAI(
+                api_key=backend.get("api_key")
+                or os.getenv(backend.get("api_key_env", "OPENAI_API_KEY"))
+                or "none",
+                base_url=backend["base_url"],
+                max_retries=0,
+            ),
+            backend.get("model"),
+            backend.get("jobs", config.jobs),
+            backend.get("rpm", 0),
+            backend.get("tpm", 0),
+            len(backends) > 1,
+        )
+        for backend in backends
+    ]
+
+
+# Requests all backends take at the same time, each takes --jobs unless it's configured otherwise
+def get_jobs(config):
+    backends = config.toml.get("backends", [])
+    if not backends:
+        return config.jobs
+
+    return sum(backend.get("jobs", config.jobs) for backend in backends)
+
+
+def backoff(attempt):
+    return random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2**attempt))
+
+
+def get_retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    retry_after_ms = response.headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = response.headers.get("retry-after")
+    if not retry_after:
+        return None
+
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+
+    try:
+        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def estimate_messages_tokens(messages):
+    return sum(estimate_tokens(message["content"]) + 4 for message in messages) + 3
+
+
+def estimate_completion_tokens(translate_content):
+    return estimate_tokens(translate_content) * 3 // 2
@@ -1,39 +1,70 @@
+from functools import partial
+
 from fluent.syntax import parse
-from fluent.syntax.ast import Message
+from fluent.syntax.ast import GroupComment, Message
 
-from gpt_ftl.ftl_file import get_paths
-from gpt_ftl.parser import MessageParser
+from gpt_ftl.ftl_file import get_paths, map_paths, write_atomic
 from gpt_ftl.print_colored import (
     print_action_start,
+    print_action_done,
     print_batch_action,
     format_value,
-    print_error,
 )
 
 
 def sort_messages(content, separate):
-    body = parse(content).body
-    new_content = ""
+    sections = [Section(None)]
+    for elem in parse(content).body:
+        if isinstance(elem, GroupComment):
+            sections.append(Section(elem))
+        elif isinstance(elem, Message):
+            sections[-1].messages.append(elem)
+        else:
+            sections[-1].entries.append(elem)
+
+    message_separator = "\n\n" if separate else "\n"
+
+    parts = []
+    for section in sections:
+        if section.comment:
+            parts += [get_source(content, section.comment), "\n\n"]
+
+        for entry in section.entries:
+            parts += [get_source(content, entry), "\n\n"]
+
+        for message in sorted(section.messages, key=lambda m: m.id.name):
+            parts += [get_source(content, message), message_separator]
+
+        if section.messages and not separate:
+            parts.append("\n")
 
-    message_parsers = []
-    for elem in body:
-        if not isinstance(elem, Message):
-            print_error("Only message comments are supported when sorting messages.")
-            exit(1)
+    while parts and parts[-1] in ("\n", "\n\n"):
+        parts.pop()
 
-        message_parsers.append(MessageParser(ftl_content=content, ftl_message=elem))
+    return "".join(parts) + "\n" if parts else ""
 
-    message_parsers_sorted = sorted(message_parsers, key=lambda p: p.identifier)
 
-    for parser in message_parsers_sorted:
-        new_content += parser.get_ftl() + "\n"
-        if separate:
-            new_content += "\n"
+class Section:
+    def __init__(self, comment):
+        self.comment = comment
+        self.entries = []
+        self.messages = []
 
-    if new_content.endswith("\n\n"):
-        new_content = new_content[:-1]
 
-    return new_content
+def get_source(content, elem):
+    return content[elem.span.start : elem.span.end].rstrip("\n")
+
+
+def sort_file(path, separate):
+    with open(path, "r") as f:
+        content = f.read()
+
+    new_content = sort_messages(content, separate)
+    if new_content == content:
+        return False
+
+    write_atomic(path, new_content)
+    return True
 
 
 def main(config):
@@ -41,13 +72,19 @@ def main(config):
 
     paths = get_paths(config.root)
 
-    for i, path in enumerate(paths):
+    changed = 0
+    for i, (path, file_changed) in enumerate(
+        zip(
+            paths,
+            map_paths(partial(sort_file, separate=config.separate), paths, config.jobs),
+        )
+    ):
         print_batch_action(
-            f"Sorting messages in {format_value(path)}...", i + 1, len(paths)
+            f"Sorted messages in {format_value(path)}"
+            f"{'' if file_changed else ' (unchanged)'}...",
+            i + 1,
+            len(paths),
         )
+        changed += file_changed
 
-        with open(path, "r") as f:
-            content = sort_messages(f.read(), config.separate)
-
-        with open(path, "w") as f:
-            f.write(content)
+    print_action_done(f"Sorted messages in {changed} of {len(paths)} files.")
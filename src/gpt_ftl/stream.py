@@ -0,0 +1,96 @@
+import json
+
+WHITESPACE = " \t\n\r"
+
+decoder = json.JSONDecoder()
+
+
+class JsonMemberStream:
+    def __init__(self, depth):
+        self.depth = depth
+        self.buffer = ""
+        self.keys = []
+        self.started = False
+        self.finished = False
+
+    def feed(self, text):
+        self.buffer += text
+        members = []
+
+        while not self.finished:
+            member = self.next_member()
+            if member is None:
+                break
+
+            if member is not True:
+                members.append(member)
+
+        return members
+
+    def close(self):
+        if not self.finished:
+            raise json.JSONDecodeError("Incomplete JSON object", self.buffer, 0)
+
+    def next_member(self):
+        position = skip(self.buffer, 0, WHITESPACE + ",")
+        if position == len(self.buffer):
+            return None
+
+        if not self.started:
+            if self.buffer[position] != "{":
+                raise json.JSONDecodeError("Expecting '{'", self.buffer, position)
+
+            self.started = True
+            return self.consume(position + 1)
+
+        if self.buffer[position] == "}":
+            if self.keys:
+                self.keys.pop()
+            else:
+                self.finished = True
+
+            return self.consume(position + 1)
+
+        try:
+            key, position = decoder.raw_decode(self.buffer, position)
+        except json.JSONDecodeError:
+            return None
+
+        position = skip(self.buffer, position, WHITESPACE)
+        if position == len(self.buffer):
+            return None
+        if self.buffer[position] != ":":
+            raise json.JSONDecodeError("Expecting ':'", self.buffer, position)
+
+        position = skip(self.buffer, position + 1, WHITESPACE)
+        if position == len(self.buffer):
+            return None
+
+        if len(self.keys) < self.depth - 1:
+            if self.buffer[position] != "{":
+                raise json.JSONDecodeError("Expecting '{'", self.buffer, position)
+
+            self.keys.append(key)
+            return self.consume(position + 1)
+
+        try:
+            value, end = decoder.raw_decode(self.buffer, position)
+        except json.JSONDecodeError:
+            return None
+
+        if not isinstance(value, (str, list, dict)) and end == len(self.buffer):
+            return None
+
+        self.consume(end)
+        return tuple(self.keys) + (key,), value
+
+    def consume(self, position):
+        self.buffer = self.buffer[position:]
+        return True
+
+
+def skip(text, position, chars):
+    while position < len(text) and text[position] in chars:
+        position += 1
+
+    return position
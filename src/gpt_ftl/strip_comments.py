@@ -1,5 +1,10 @@
-from gpt_ftl.ftl_file import get_paths
-from gpt_ftl.print_colored import print_action_start, format_value, print_batch_action
+from gpt_ftl.ftl_file import get_paths, map_paths, write_atomic
+from gpt_ftl.print_colored import (
+    print_action_start,
+    print_action_done,
+    format_value,
+    print_batch_action,
+)
 
 
 def is_comment(line):
@@ -7,22 +12,34 @@ def is_comment(line):
 
 
 def strip_comments(content):
-    new_content = ""
+    lines = []
+    after_comment = False
 
-    lines = content.splitlines()
-    for i, line in enumerate(lines):
+    for line in content.splitlines():
         if is_comment(line):
+            after_comment = True
             continue
         elif line == "":
-            last_non_empty_line_idx = i - 1
-            while lines[last_non_empty_line_idx] == "" and last_non_empty_line_idx > 0:
-                last_non_empty_line_idx -= 1
-            if is_comment(lines[last_non_empty_line_idx]):
+            if after_comment:
                 continue
+        else:
+            after_comment = False
 
-        new_content += line + "\n"
+        lines.append(line)
 
-    return new_content
+    return "".join(line + "\n" for line in lines)
+
+
+def strip_file(path):
+    with open(path, "r") as f:
+        content = f.read()
+
+    new_content = strip_comments(content)
+    if new_content == content:
+        return False
+
+    write_atomic(path, new_content)
+    return True
 
 
 def main(config):
@@ -30,13 +47,16 @@ def main(config):
 
     paths = get_paths(config.root)
 
-    for i, path in enumerate(paths):
+    changed = 0
+    for i, (path, file_changed) in enumerate(
+        zip(paths, map_paths(strip_file, paths, config.jobs))
+    ):
         print_batch_action(
-            f"Stripping comments from {format_value(path)}...", i + 1, len(paths)
+            f"Stripped comments from {format_value(path)}"
+            f"{'' if file_changed else ' (unchanged)'}...",
+            i + 1,
+            len(paths),
         )
+        changed += file_changed
 
-        with open(path, "r") as f:
-            content = strip_comments(f.read())
-
-        with open(path, "w") as f:
-            f.write(content)
+    print_action_done(f"Stripped comments from {changed} of {len(paths)} files.")
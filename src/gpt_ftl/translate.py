@@ -0,0 +1,190 @@
+import asyncio
+import os
+from functools import partial
+
+from openai import AsyncOpenAI
+
+from gpt_ftl.batch import get_batch_results
+from gpt_ftl.cache import get_translation_memory
+from gpt_ftl.engine import Engine
+from gpt_ftl.ftl_file import get_base_file_paths, get_file, get_path
+from gpt_ftl.index import get_index
+from gpt_ftl.journal import Journal
+from gpt_ftl.lockfile import Lockfile
+from gpt_ftl.metrics import Metrics
+from gpt_ftl.planner import Planner
+from gpt_ftl.print_colored import (
+    print_action_start,
+    print_action_done,
+    format_value,
+    format_list,
+    print_error,
+    footer,
+)
+from gpt_ftl.scheduler import Scheduler, get_jobs
+from gpt_ftl.translator import Translator
+from gpt_ftl.writer import Writer
+
+
+def main(config):
+    if not config.plan:
+        require_api_key(config)
+
+    index = get_index(config)
+
+    print_action_start("Getting files to translate...")
+    base_files = get_base_file_paths(config.root, config.base_lang, index)
+    print_action_done(
+        f"Files to translate:\n{format_list([file.name for file in base_files])}"
+    )
+
+    print_action_start("Getting target languages...")
+    langs = get_langs(config)
+    print_action_done(f"Target languages:\n{format_list(langs)}")
+
+    memory = get_translation_memory(config)
+    lockfile = Lockfile(config.root)
+    journal = Journal(config)
+    journal.apply(lockfile)
+
+    if journal.done:
+        print_action_done(
+            f"Resuming, skipping {len(journal.done)} files translated in the previous run."
+        )
+
+    print_action_start("Planning translations...")
+    plan = Planner(memory, lockfile, config).plan(
+        get_units(config, index, journal, base_files, langs)
+    )
+    plan.print_summary()
+    if config.plan_json:
+        plan.write(config.plan_json)
+
+    if config.plan:
+        memory.close()
+        index.save()
+        return
+
+    print_action_start(
+        f"Translating {len(plan.units)} files with up to "
+        f"{format_value(str(get_jobs(config)))} requests at a time..."
+    )
+
+    try:
+        engine, metrics = asyncio.run(
+            translate(config, plan, memory, lockfile, journal)
+        )
+    except KeyboardInterrupt:
+        print_error("Translation cancelled.")
+        exit(130)
+    finally:
+        index.save()
+
+    metrics.print_summary()
+    if config.metrics:
+        metrics.write(config.metrics)
+
+    if engine.failed:
+        print_error(f"Failed to translate:\n{format_list(engine.failed)}")
+        exit(1)
+
+    print_action_done(
+        "All files translated and written to their respective directories."
+    )
+    print_action_start(f"{format_value('Thank you for using GPT FTL!')}\n{footer()}")
+
+
+async def translate(config, plan, memory, lockfile, journal):
+    metrics = Metrics(config)
+    # Repairs are only known once the batch's responses are validated, so they're sent right away
+    repair_scheduler = Scheduler(metrics, config)
+
+    complete = False
+    try:
+        if config.batch or config.batch_id:
+            async with AsyncOpenAI(
+                api_key=config.api_key, base_url=config.base_url, max_retries=0
+            ) as client:
+                scheduler = await get_batch_results(client, metrics, config, plan)
+        else:
+            scheduler = repair_scheduler
+
+        engine = await translate_plan(
+            config, plan, scheduler, repair_scheduler, memory, lockfile, journal
+        )
+        complete = not engine.failed
+    finally:
+        await repair_scheduler.close()
+        memory.close()
+        lockfile.save()
+        journal.close(complete)
+
+    return engine, metrics
+
+
+async def translate_plan(
+    config, plan, scheduler, repair_scheduler, memory, lockfile, journal
+):
+    engine = Engine(get_jobs(config))
+
+    writer = Writer()
+    writer.start()
+    translator = Translator(
+        scheduler, memory, lockfile, journal, writer, config, repair_scheduler
+    )
+
+    for unit in plan.units:
+        engine.add(
+            ", ".join(file.lang for file in unit.files),
+            unit.name,
+            partial(translator.translate, unit),
+        )
+
+    await engine.run()
+    await writer.close()
+
+    return engine
+
+
+# The Batch API is only available from OpenAI, other requests may go to the backends of the configuration file instead
+def require_api_key(config):
+    if not config.api_key and (
+        config.batch or config.batch_id or not config.toml.get("backends")
+    ):
+        print_error(
+            f"Please set the environment variable {format_value('OPENAI_API_KEY')} or pass it with the "
+            f"{format_value('--api-key')} argument."
+        )
+        exit(1)
+
+
+def get_langs(config):
+    return [
+        lang
+        for lang in os.listdir(config.root)
+        if lang != config.base_lang and os.path.isdir(os.path.join(config.root, lang))
+    ]
+
+
+def get_units(config, index, journal, base_files, langs):
+    lang_groups = [
+        langs[i : i + config.locales_per_request]
+        for i in range(0, len(langs), config.locales_per_request)
+    ]
+
+    units = []
+    for base_file in base_files:
+        for lang_group in lang_groups:
+            lang_group = [
+                lang for lang in lang_group if not journal.is_done(base_file, lang)
+            ]
+            if not lang_group:
+                continue
+
+            files = [
+                get_file(get_path(config.root, lang, base_file.name), lang, index)
+                for lang in lang_group
+            ]
+            units.append((base_file, files))
+
+    return units
@@ -0,0 +1,231 @@
+import asyncio
+import json
+from functools import partial
+
+from gpt_ftl.parser import MessageParser
+from gpt_ftl.planner import create_request
+from gpt_ftl.print_colored import print_warning, format_value, format_list
+from gpt_ftl.stream import JsonMemberStream
+from gpt_ftl.validator import ValidationError, validate, validate_response
+
+
+class Translator:
+    def __init__(
+        self, scheduler, memory, lockfile, journal, writer, config, repair_scheduler
+    ):
+        self.scheduler = scheduler
+        self.memory = memory
+        self.lockfile = lockfile
+        self.journal = journal
+        self.writer = writer
+        self.config = config
+        self.repair_scheduler = repair_scheduler
+        self.tasks = {}
+
+    async def translate(self, unit):
+        base_file = unit.base_file
+
+        for file in unit.skipped:
+            self.journal.record(
+                base_file, file, self.lockfile.update(base_file, file, [])
+            )
+
+        results = await asyncio.gather(
+            *(self.get_task(unit, request) for request in unit.requests),
+            *(self.add_shared(target) for target in unit.targets.values()),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+
+        # Translations received before an error are still written, but the file isn't recorded as translated
+        written = {}
+        for target in unit.targets.values():
+            self.writer.put(target, target.cached_messages)
+            written[target] = self.writer.finish(base_file, target)
+
+        for target, identifiers in written.items():
+            identifiers = await identifiers
+
+            if not errors:
+                self.journal.record(
+                    base_file,
+                    target.file,
+                    self.lockfile.update(base_file, target.file, identifiers),
+                )
+
+        if errors:
+            raise errors[0]
+
+    # Requests are shared by the unit they belong to and the units with identical strings, whichever needs them first
+    # sends them, so that a unit never waits for a unit that hasn't started
+    def get_task(self, unit, request):
+        if request not in self.tasks:
+            self.tasks[request] = asyncio.ensure_future(
+                self.request_translation(unit, request)
+            )
+
+        return self.tasks[request]
+
+    async def add_shared(self, target):
+        messages = []
+        error = None
+
+        for identifier, share in target.shared.items():
+            try:
+                await self.get_task(share.unit, share.request)
+            except Exception as e:
+                error = error or e
+
+            if share.value is not None:
+                messages.append(MessageParser(json=(identifier, share.value)))
+
+        self.add_translations(target, messages)
+        if len(messages) < len(target.shared):
+            raise error or ValidationError(
+                f"{len(target.shared) - len(messages)} shared translations are missing"
+            )
+
+    def add_translations(self, target, messages):
+        messages = [
+            message
+            for message in messages
+            if message.identifier in target.untranslated
+            or message.identifier in target.shared
+        ]
+
+        for message in messages:
+            if message.identifier in target.shares:
+                target.shares[message.identifier].value = message.value
+
+        self.memory.set_many(
+            (target.keys[message.identifier], message.value) for message in messages
+        )
+        self.writer.put(target, messages)
+
+    async def request_translation(self, unit, request):
+        failures = await self.send(unit, request, self.scheduler, self.config.stream)
+        name = request.name
+
+        for repair in range(self.config.max_repairs):
+            if not failures:
+                return
+
+            print_warning(
+                f"Requesting {len(failures)} invalid translations of {format_value(name)} again:\n"
+                f"{format_failures(failures)}"
+            )
+
+            langs = {lang for lang, _ in failures}
+            identifiers = {identifier for _, identifier in failures}
+            request = create_request(
+                f"{name} (repair {repair + 1}/{self.config.max_repairs})",
+                [lang for lang in request.langs if lang in langs],
+                [
+                    message
+                    for message in request.sources.values()
+                    if message.identifier in identifiers
+                ],
+                unit.system_messages,
+                self.config,
+            )
+            # Translations that were already valid aren't failures even if the repair got them wrong
+            repaired = await self.send(unit, request, self.repair_scheduler, False)
+            failures = {
+                pair: reason for pair, reason in repaired.items() if pair in failures
+            }
+
+        if failures:
+            raise ValidationError(
+                f"{len(failures)} translations are still invalid after {self.config.max_repairs} repairs:\n"
+                f"{format_failures(failures)}"
+            )
+
+    # Returns the reason each translation of the request that was missing or invalid failed
+    async def send(self, unit, request, scheduler, stream):
+        if not stream:
+            content = await scheduler.request(
+                request.model,
+                request.messages,
+                request.completion_tokens,
+                request.name,
+                request.langs,
+            )
+
+            translations, failures = validate_response(request, content)
+            for lang, messages in translations.items():
+                self.add_translations(unit.targets[lang], messages)
+
+            return failures
+
+        failures = {}
+        listener = StreamedTranslation(
+            request.langs, partial(self.add_streamed, unit.targets, request, failures)
+        )
+
+        try:
+            await scheduler.request(
+                request.model,
+                request.messages,
+                request.completion_tokens,
+                request.name,
+                request.langs,
+                listener,
+            )
+            listener.close()
+        except json.JSONDecodeError as e:
+            print_warning(
+                f"The response of {format_value(request.name)} isn't valid JSON: {e}"
+            )
+
+        for lang in request.langs:
+            for identifier in request.sources:
+                if (lang, identifier) not in listener.received:
+                    failures[(lang, identifier)] = "The message is missing"
+
+        return failures
+
+    def add_streamed(self, targets, request, failures, lang, identifier, value):
+        if identifier not in request.sources:
+            return
+
+        try:
+            value = validate(
+                request.sources[identifier], value, request.placeables[identifier]
+            )
+        except ValidationError as e:
+            failures[(lang, identifier)] = str(e)
+            return
+
+        self.add_translations(targets[lang], [MessageParser(json=(identifier, value))])
+
+
+def format_failures(failures):
+    return format_list(
+        [
+            f"{identifier} ({lang}): {reason}"
+            for (lang, identifier), reason in failures.items()
+        ]
+    )
+
+
+class StreamedTranslation:
+    def __init__(self, langs, on_message):
+        self.langs = langs
+        self.on_message = on_message
+        self.received = set()
+        self.stream = None
+
+    def start(self):
+        self.stream = JsonMemberStream(1 if len(self.langs) == 1 else 2)
+
+    def feed(self, text):
+        for keys, value in self.stream.feed(text):
+            lang = self.langs[0] if len(self.langs) == 1 else keys[0]
+            if lang not in self.langs or (lang, keys[-1]) in self.received:
+                continue
+
+            self.received.add((lang, keys[-1]))
+            self.on_message(lang, keys[-1], value)
+
+    def close(self):
+        self.stream.close()
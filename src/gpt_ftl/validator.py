@@ -0,0 +1,114 @@
+import json
+
+from gpt_ftl.parser import MessageParser
+from gpt_ftl.placeables import PlaceableError, get_selector, get_variant_keys, unmask
+
+VARIANT_KEYS = {"variable": str, "variant": str, "translation": str, "is_default": bool}
+
+# Languages need different plural categories than the source, so these may be added or left out
+PLURAL_CATEGORIES = {"zero", "one", "two", "few", "many", "other"}
+
+
+class ValidationError(ValueError):
+    pass
+
+
+# Returns the valid translations of each language and the reason each invalid or missing one failed, keyed by language
+# and identifier, so that only the failed ones have to be requested again
+def validate_response(request, content):
+    translations = {lang: [] for lang in request.langs}
+    failures = {}
+
+    try:
+        response = json.loads(content)
+    except ValueError as e:
+        return translations, get_failures(request, f"The response isn't JSON: {e}")
+
+    if len(request.langs) == 1:
+        response = {request.langs[0]: response}
+    if not isinstance(response, dict):
+        return translations, get_failures(request, "The response isn't a JSON object")
+
+    for lang in request.langs:
+        values = response.get(lang)
+        if not isinstance(values, dict):
+            failures.update(get_failures(request, "The language is missing", [lang]))
+            continue
+
+        for identifier, source in request.sources.items():
+            if identifier not in values:
+                failures[(lang, identifier)] = "The message is missing"
+                continue
+
+            try:
+                value = validate(
+                    source, values[identifier], request.placeables[identifier]
+                )
+            except ValidationError as e:
+                failures[(lang, identifier)] = str(e)
+                continue
+
+            translations[lang].append(MessageParser(json=(identifier, value)))
+
+    return translations, failures
+
+
+def validate(source, value, placeables):
+    selector = get_selector(source.value)
+
+    if selector is None and not isinstance(value, str):
+        raise ValidationError("The translation isn't a string")
+    if selector is not None:
+        validate_variants(selector, value, source.value)
+
+    try:
+        return unmask(value, placeables)
+    except PlaceableError as e:
+        raise ValidationError(str(e))
+
+
+def validate_variants(selector, value, source):
+    if not isinstance(value, list) or not value:
+        raise ValidationError("The translation isn't a list of variants")
+
+    for variant in value:
+        if not isinstance(variant, dict) or any(
+            not isinstance(variant.get(key), kind) for key, kind in VARIANT_KEYS.items()
+        ):
+            raise ValidationError(
+                f"A variant doesn't have the keys {', '.join(VARIANT_KEYS)}"
+            )
+        if variant["variable"].strip() != selector:
+            raise ValidationError(
+                f"The variable {variant['variable']} doesn't match {selector}"
+            )
+
+    defaults = len([variant for variant in value if variant["is_default"]])
+    if defaults != 1:
+        raise ValidationError(f"There are {defaults} default variants instead of 1")
+
+    variants = [variant["variant"].strip() for variant in value]
+    if len(set(variants)) != len(variants):
+        raise ValidationError("A variant is repeated")
+
+    keys, default = get_variant_keys(source)
+    for variant in variants:
+        if variant not in keys and variant not in PLURAL_CATEGORIES:
+            raise ValidationError(f"The variant {variant} isn't in the source")
+    for key in keys:
+        if key not in variants and key not in PLURAL_CATEGORIES:
+            raise ValidationError(f"The variant {key} is missing")
+
+    if not any(
+        variant["is_default"] and variant["variant"].strip() == default
+        for variant in value
+    ):
+        raise ValidationError(f"The default variant isn't {default}")
+
+
+def get_failures(request, reason, langs=None):
+    return {
+        (lang, identifier): reason
+        for lang in langs or request.langs
+        for identifier in request.sources
+    }
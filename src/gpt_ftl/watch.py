@@ -0,0 +1,237 @@
+import asyncio
+import os
+import struct
+import sys
+
+from gpt_ftl.cache import get_translation_memory
+from gpt_ftl.ftl_file import BaseFtlFile, get_base_file_paths, get_path
+from gpt_ftl.index import get_index
+from gpt_ftl.journal import Journal
+from gpt_ftl.lockfile import Lockfile
+from gpt_ftl.metrics import Metrics
+from gpt_ftl.planner import Planner
+from gpt_ftl.print_colored import (
+    print_action_start,
+    print_action_done,
+    print_warning,
+    print_error,
+    format_value,
+    format_list,
+)
+from gpt_ftl.scheduler import Scheduler
+from gpt_ftl.translate import get_langs, get_units, require_api_key, translate_plan
+
+# IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO and IN_DELETE, editors either write the file or move a new one over it
+INOTIFY_MASK = 0x8 | 0x40 | 0x80 | 0x200
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def main(config):
+    require_api_key(config)
+
+    index = get_index(config)
+    memory = get_translation_memory(config)
+    lockfile = Lockfile(config.root)
+
+    try:
+        asyncio.run(watch(config, index, memory, lockfile))
+    except KeyboardInterrupt:
+        print_action_done("Stopped watching.")
+    finally:
+        memory.close()
+        index.save()
+
+
+# The index, translation memory, lockfile and API clients are kept between changes, so a change only pays for parsing
+# the changed base file and requesting its changed messages
+async def watch(config, index, memory, lockfile):
+    path = os.path.join(config.root, config.base_lang)
+    changed = set()
+    event = asyncio.Event()
+
+    def on_change(name):
+        if name.endswith(".ftl"):
+            changed.add(name)
+            event.set()
+
+    watcher = get_watcher(path, on_change, config)
+    watcher.start()
+
+    metrics = Metrics(config)
+    scheduler = Scheduler(metrics, config)
+
+    try:
+        print_action_start("Translating messages changed since the last run...")
+        await translate_changes(config, index, memory, lockfile, scheduler, None)
+
+        while True:
+            print_action_start(f"Watching {format_value(path)} for changes...")
+            await event.wait()
+            await wait_for_quiet(event, config.debounce)
+
+            names = sorted(changed)
+            changed.clear()
+
+            print_action_start(f"Translating changes to:\n{format_list(names)}")
+            await translate_changes(config, index, memory, lockfile, scheduler, names)
+    finally:
+        watcher.close()
+        await scheduler.close()
+        metrics.print_summary()
+
+
+# Waits until no file has been saved for the given seconds, so that a burst of saves is translated once
+async def wait_for_quiet(event, seconds):
+    while True:
+        event.clear()
+
+        try:
+            await asyncio.wait_for(event.wait(), seconds)
+        except asyncio.TimeoutError:
+            return
+
+
+# Translates the base files with the given names, or all of them if there are no names
+async def translate_changes(config, index, memory, lockfile, scheduler, names):
+    journal = Journal(config)
+    complete = False
+
+    # A failed change is reported and the next save is waited for, instead of stopping the watch
+    try:
+        base_files = get_base_files(config, index, names)
+        for base_file in base_files:
+            lockfile.forget_hashes(base_file)
+
+        plan = Planner(memory, lockfile, config).plan(
+            get_units(config, index, journal, base_files, get_langs(config))
+        )
+        plan.print_summary()
+
+        engine = await translate_plan(
+            config, plan, scheduler, scheduler, memory, lockfile, journal
+        )
+        complete = not engine.failed
+
+        if engine.failed:
+            print_error(f"Failed to translate:\n{format_list(engine.failed)}")
+    except Exception as e:
+        print_error(f"Failed translating the changes: {e}")
+    finally:
+        lockfile.save()
+        index.save()
+        journal.close(complete)
+
+
+def get_base_files(config, index, names):
+    if names is None:
+        return get_base_file_paths(config.root, config.base_lang, index)
+
+    # Deleted files are left out, their translations are kept
+    return [
+        BaseFtlFile(path, config.base_lang, index)
+        for path in (get_path(config.root, config.base_lang, name) for name in names)
+        if os.path.exists(path)
+    ]
+
+
+def get_watcher(path, on_change, config):
+    if config.poll:
+        return PollingWatcher(path, on_change, config.poll_interval)
+
+    # inotify is only available on Linux, elsewhere the C library may not even be found
+    if not sys.platform.startswith("linux"):
+        return PollingWatcher(path, on_change, config.poll_interval)
+
+    try:
+        return InotifyWatcher(path, on_change)
+    except (OSError, AttributeError, TypeError):
+        print_warning(
+            f"inotify isn't available, checking for changes every {config.poll_interval} seconds instead."
+        )
+        return PollingWatcher(path, on_change, config.poll_interval)
+
+
+# Uses the inotify API of Linux through the C library, so that changes are noticed without checking the files
+class InotifyWatcher:
+    def __init__(self, path, on_change):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "Failed to initialize inotify")
+
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), INOTIFY_MASK) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"Failed to watch {path}")
+
+        self.on_change = on_change
+
+    def start(self):
+        asyncio.get_event_loop().add_reader(self.fd, self.read)
+
+    def read(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        position = 0
+        while position < len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, position)
+            position += INOTIFY_EVENT.size
+
+            self.on_change(
+                os.fsdecode(data[position : position + length].rstrip(b"\0"))
+            )
+            position += length
+
+    def close(self):
+        asyncio.get_event_loop().remove_reader(self.fd)
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    def __init__(self, path, on_change, interval):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.stats = get_stats(path)
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.ensure_future(self.run())
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+
+            stats = get_stats(self.path)
+            for name in stats.keys() | self.stats.keys():
+                if stats.get(name) != self.stats.get(name):
+                    self.on_change(name)
+
+            self.stats = stats
+
+    def close(self):
+        self.task.cancel()
+
+
+def get_stats(path):
+    stats = {}
+
+    for entry in os.scandir(path):
+        if not entry.name.endswith(".ftl"):
+            continue
+
+        # Files can be deleted or moved between listing and checking them, they're seen as deleted
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+
+        stats[entry.name] = (stat.st_mtime_ns, stat.st_size)
+
+    return stats
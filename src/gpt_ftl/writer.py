@@ -0,0 +1,56 @@
+import asyncio
+
+from gpt_ftl.parser import Parser
+
+
+class Writer:
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.pending = {}
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.ensure_future(self.run())
+
+    async def close(self):
+        self.queue.put_nowait(None)
+        await self.task
+
+    def put(self, target, messages):
+        self.queue.put_nowait((target, messages, None, None))
+
+    # Returns the identifiers of the messages written once the file is written
+    def finish(self, base_file, target):
+        written = asyncio.get_event_loop().create_future()
+        self.queue.put_nowait((target, [], base_file, written))
+
+        return written
+
+    async def run(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+
+            target, messages, base_file, written = item
+
+            pending = self.pending.setdefault(target, {})
+            for message in messages:
+                pending.setdefault(message.identifier, message)
+
+            if not written:
+                continue
+
+            parser = Parser({})
+            parser.messages = list(self.pending.pop(target).values())
+            parser.sort(base_file.message_identifiers)
+
+            try:
+                await asyncio.get_event_loop().run_in_executor(
+                    None, target.file.write, parser.messages, base_file
+                )
+            except Exception as e:
+                written.set_exception(e)
+                continue
+
+            written.set_result([message.identifier for message in parser.messages])